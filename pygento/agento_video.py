@@ -19,22 +19,459 @@ import argparse
 import json
 import os
 import sys
+import threading
+import uuid
+import functools
 import hashlib
 import time
-import mimetypes
+import mmap
+import re
+import shutil
+from collections import OrderedDict
+from concurrent.futures import Executor, ThreadPoolExecutor, as_completed, TimeoutError as FutureTimeoutError
 from pathlib import Path
-from typing import Optional, Dict, Any
-from urllib.parse import urlparse
-import requests
-from google import generativeai as genai
+from typing import TYPE_CHECKING, Optional, Dict, Any, Callable, Hashable, Iterator, Union
+from urllib.parse import parse_qsl, unquote, urlencode, urlparse, urlsplit, urlunsplit
+
+if TYPE_CHECKING:
+    import requests
 
 # Try to load python-dotenv if available, otherwise use manual .env parsing
 try:
-    from dotenv import load_dotenv
+    from dotenv import dotenv_values, load_dotenv
     _dotenv_available = True
 except ImportError:
     _dotenv_available = False
 
+# Use pybase64 for image encoding if available (SIMD-accelerated, same API as base64)
+try:
+    import pybase64 as _b64
+except ImportError:
+    import base64 as _b64
+
+# Use orjson for request bodies if available (serializes large base64 strings much faster)
+try:
+    import orjson
+    _orjson_available = True
+except ImportError:
+    _orjson_available = False
+
+
+# Production Gemini API endpoint and Veo model
+GOOGLE_API_HOST = 'generativelanguage.googleapis.com'
+DEFAULT_API_BASE_URL = f'https://{GOOGLE_API_HOST}/v1beta'
+DEFAULT_VIDEO_MODEL = 'veo-3.1-generate-preview'
+
+# Default .env location (module root), checked before the current directory
+_SCRIPT_ENV_FILE = Path(__file__).parent.parent / '.env'
+
+# One KEY=value assignment per line for the manual .env parser: double quoted,
+# single quoted or bare value, optionally followed by a whitespace-separated # comment
+_ENV_LINE_RE = re.compile(
+    rb'^[ \t]*([A-Za-z_][A-Za-z0-9_.]*)[ \t]*=[ \t]*'
+    rb'(?:"([^"\r\n]*)"|\'([^\'\r\n]*)\'|([^\r\n]*?))'
+    rb'(?:[ \t]+#[^\r\n]*|[ \t]*)\r?$',
+    re.M
+)
+
+# Chunk size used when streaming downloads to disk
+DOWNLOAD_CHUNK_SIZE = 1 << 20
+
+# Largest source image accepted from a URL (the API limits inline request data to 20 MB)
+MAX_IMAGE_BYTES = 20 * 1024 * 1024
+
+# Upper bound on images processed concurrently by the CLI
+MAX_PARALLEL_GENERATIONS = 8
+
+# Image inputs starting with these are downloaded instead of read from disk
+_URL_PREFIXES = ('http://', 'https://')
+
+# Generic image references in prompts ("image1", "image 2", "first image", "second image")
+_IMAGE_REF_RE = re.compile(r'image ?[12]|first image|second image', re.IGNORECASE)
+
+# MIME types for the image extensions accepted as video sources
+_EXT_MIME = {
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.png': 'image/png',
+    '.webp': 'image/webp',
+    '.gif': 'image/gif',
+    '.bmp': 'image/bmp',
+    '.heic': 'image/heic',
+    '.heif': 'image/heif',
+}
+
+# Loaded images shared by all generators, keyed by URL or resolved file path,
+# bounded by entry count and total size
+IMAGE_CACHE_SIZE = 64
+IMAGE_CACHE_MAX_BYTES = 256 * 1024 * 1024
+_IMAGE_CACHE: 'OrderedDict[str, tuple[Hashable, bytes, str, Optional[float]]]' = OrderedDict()
+_IMAGE_CACHE_BYTES = 0
+_IMAGE_KEY_LOCKS: Dict[str, threading.Lock] = {}
+_IMAGE_CACHE_LOCK = threading.Lock()
+
+# Seconds a URL image without ETag/Last-Modified (which can't be revalidated) is reused
+URL_IMAGE_TTL = 300
+
+# Entries kept per generator in its per-URL memos (validators and input cache keys)
+URL_MEMO_SIZE = 256
+
+# Shared HTTP session so polling, downloads and image fetches reuse
+# keep-alive connections instead of doing a TCP+TLS handshake per request.
+# Created on first use so importing this module (or running --help) does not load requests.
+_SESSION = None
+_SESSION_LOCK = threading.Lock()
+
+
+def get_session() -> 'requests.Session':
+    """
+    Get the shared HTTP session used for all API and download requests
+    
+    Returns:
+        Shared requests.Session (mount custom adapters on it to change retry/pool behaviour)
+    """
+    global _SESSION
+    if _SESSION is None:
+        with _SESSION_LOCK:
+            if _SESSION is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                from urllib3.util.retry import Retry
+                
+                # Retry transient 5xx responses and connection resets so one bad poll
+                # doesn't abort a minutes-long generation. POST is left out of the
+                # retried methods: resubmitting could start (and bill) a second job.
+                retry = Retry(
+                    total=5,
+                    backoff_factor=0.5,
+                    status_forcelist=(500, 502, 503, 504),
+                    respect_retry_after_header=True,
+                    raise_on_status=False
+                )
+                session = requests.Session()
+                session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=10, max_retries=retry))
+                _SESSION = session
+    return _SESSION
+
+
+def _backoff_intervals(initial: float, cap: float, factor: float = 1.6) -> Iterator[float]:
+    """
+    Yield exponentially growing wait intervals
+    
+    Short jobs are noticed quickly while long jobs don't poll more often than needed.
+    
+    Args:
+        initial: First interval in seconds
+        cap: Maximum interval in seconds
+        factor: Growth factor between intervals
+        
+    Yields:
+        Interval in seconds
+    """
+    interval = min(initial, cap)
+    while True:
+        yield interval
+        interval = min(interval * factor, cap)
+
+
+def _log_stderr(*args: Any) -> None:
+    """Print a verbose debug message to stderr"""
+    print(*args, file=sys.stderr)
+
+
+def _noop(*args: Any) -> None:
+    """Discard a verbose debug message (verbose mode off)"""
+
+
+def _dump_json(data: Any) -> bytes:
+    """
+    Serialize data to a compact JSON request body
+    
+    Args:
+        data: JSON-serializable data
+        
+    Returns:
+        UTF-8 encoded JSON
+    """
+    if _orjson_available:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(',', ':')).encode('utf-8')
+
+
+def _print_json(data: Any, path: Optional[str] = None) -> None:
+    """
+    Write the CLI result as indented JSON to stdout (or to a file)
+    
+    Uses orjson when available and writes the encoded bytes directly.
+    
+    Args:
+        data: JSON-serializable data
+        path: File to write instead of stdout
+    """
+    if _orjson_available:
+        output = orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_APPEND_NEWLINE)
+    else:
+        output = (json.dumps(data, indent=2) + '\n').encode('utf-8')
+    if path:
+        Path(path).write_bytes(output)
+        return
+    stdout = getattr(sys.stdout, 'buffer', None)
+    if stdout is None:
+        sys.stdout.write(output.decode('utf-8'))
+        return
+    sys.stdout.flush()
+    stdout.write(output)
+    stdout.flush()
+
+
+def _new_hash(data: bytes = b''):
+    """
+    Create a hash object for cache keys
+    
+    Uses 128-bit BLAKE2b: roughly twice as fast as MD5 with the same digest length.
+    
+    Args:
+        data: Initial data to hash
+        
+    Returns:
+        hashlib BLAKE2b hash object
+    """
+    return hashlib.blake2b(data, digest_size=16, usedforsecurity=False)
+
+
+@functools.lru_cache(maxsize=128)
+def _file_hash(path: str, mtime_ns: int, size: int) -> str:
+    """
+    Hash a local file's content
+    
+    Memoized on (path, mtime_ns, size) so unchanged files are only read once.
+    
+    Args:
+        path: File path
+        mtime_ns: File modification time in nanoseconds (cache invalidation)
+        size: File size in bytes (cache invalidation)
+        
+    Returns:
+        Hex digest of the file content
+    """
+    with open(path, 'rb') as f:
+        if hasattr(hashlib, 'file_digest'):
+            # Python 3.11+: hash in fixed-size blocks straight from the file descriptor
+            return hashlib.file_digest(f, _new_hash).hexdigest()
+        if not size:
+            # mmap cannot map empty files
+            return _new_hash().hexdigest()
+        # Hash from a read-only memory map instead of reading the file into a bytes object
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return _new_hash(mm).hexdigest()
+
+
+def _get_cached_image(
+    key: str,
+    version: Hashable,
+    loader: Callable[[], tuple[bytes, str]],
+    ttl: Optional[float] = None
+) -> tuple[bytes, str]:
+    """
+    Get image data from the shared LRU cache, loading it on a miss
+    
+    Concurrent callers asking for the same key wait for a single load instead
+    of each fetching the image.
+    
+    Args:
+        key: URL or resolved local file path
+        version: Value that changes when the source changes (e.g. mtime/size or a URL
+            validator), None if unknown
+        loader: Callable returning (image_data, mime_type)
+        ttl: Seconds the loaded data may be reused (None: until the version changes)
+        
+    Returns:
+        Tuple of (image_data, mime_type)
+    """
+    global _IMAGE_CACHE_BYTES
+    
+    with _IMAGE_CACHE_LOCK:
+        key_lock = _IMAGE_KEY_LOCKS.setdefault(key, threading.Lock())
+    
+    with key_lock:
+        with _IMAGE_CACHE_LOCK:
+            entry = _IMAGE_CACHE.get(key)
+            if entry is not None and entry[0] == version and (entry[3] is None or entry[3] > time.monotonic()):
+                _IMAGE_CACHE.move_to_end(key)
+                return entry[1], entry[2]
+        
+        try:
+            image_data, mime_type = loader()
+        except BaseException:
+            # Don't keep a lock for keys that never made it into the cache
+            with _IMAGE_CACHE_LOCK:
+                if key not in _IMAGE_CACHE and _IMAGE_KEY_LOCKS.get(key) is key_lock:
+                    del _IMAGE_KEY_LOCKS[key]
+            raise
+        
+        with _IMAGE_CACHE_LOCK:
+            old = _IMAGE_CACHE.pop(key, None)
+            if old is not None:
+                _IMAGE_CACHE_BYTES -= len(old[1])
+            if len(image_data) <= IMAGE_CACHE_MAX_BYTES:
+                expires = time.monotonic() + ttl if ttl is not None else None
+                _IMAGE_CACHE[key] = (version, image_data, mime_type, expires)
+                _IMAGE_CACHE_BYTES += len(image_data)
+            else:
+                _IMAGE_KEY_LOCKS.pop(key, None)
+            while _IMAGE_CACHE and (
+                len(_IMAGE_CACHE) > IMAGE_CACHE_SIZE or _IMAGE_CACHE_BYTES > IMAGE_CACHE_MAX_BYTES
+            ):
+                evicted, evicted_entry = _IMAGE_CACHE.popitem(last=False)
+                _IMAGE_CACHE_BYTES -= len(evicted_entry[1])
+                _IMAGE_KEY_LOCKS.pop(evicted, None)
+    
+    return image_data, mime_type
+
+
+def _drop_cached_image(key: str) -> None:
+    """
+    Remove an image from the shared cache
+    
+    Args:
+        key: URL or resolved local file path
+    """
+    global _IMAGE_CACHE_BYTES
+    
+    with _IMAGE_CACHE_LOCK:
+        entry = _IMAGE_CACHE.pop(key, None)
+        if entry is not None:
+            _IMAGE_CACHE_BYTES -= len(entry[1])
+        _IMAGE_KEY_LOCKS.pop(key, None)
+
+
+def is_url(path_or_url: str) -> bool:
+    """
+    Check if the input is a URL
+    
+    Args:
+        path_or_url: Path or URL string
+        
+    Returns:
+        True if URL, False otherwise
+    """
+    return path_or_url.startswith(_URL_PREFIXES)
+
+
+def normalize_base_url(base_url: str) -> str:
+    """
+    Normalize a configured Magento base URL for building video URLs
+    
+    Args:
+        base_url: Base URL, e.g. from MAGENTO_BASE_URL
+        
+    Returns:
+        Base URL without trailing slash or the default store code
+    """
+    # Remove trailing slash and store code if present
+    base_url = base_url.rstrip('/')
+    # Remove store code (e.g., /default/)
+    if '/default/' in base_url:
+        base_url = base_url.replace('/default/', '/')
+    return base_url.rstrip('/')
+
+
+def resolve_image_path(image_path: str, base_path: Path) -> Optional[Path]:
+    """
+    Resolve image path (handle relative and absolute paths, or return None for URLs)
+    
+    Args:
+        image_path: Image path (relative to pub/media/ or absolute) or URL
+        base_path: Base path for Magento installation
+        
+    Returns:
+        Resolved absolute path, or None if URL
+    """
+    # If it's a URL, return None (will be handled separately)
+    if is_url(image_path):
+        return None
+    
+    image_path_obj = Path(image_path)
+    
+    # If absolute path, use as is
+    if image_path_obj.is_absolute():
+        return image_path_obj
+    
+    # If path starts with pub/media/, remove it
+    if str(image_path).startswith('pub/media/'):
+        image_path = str(image_path)[10:]
+    
+    # Resolve relative to pub/media/
+    return Path(base_path) / 'pub' / 'media' / image_path.lstrip('/')
+
+
+@functools.lru_cache(maxsize=256)
+def _image_reference_name(image_path: str) -> str:
+    """
+    Get the file stem used to refer to an image in prompts (memoized per path)
+    
+    Args:
+        image_path: Path to image or URL
+        
+    Returns:
+        Reference name (e.g., "background", "summer_scene")
+    """
+    if not is_url(image_path):
+        # Get filename from path (with extension for clarity)
+        path_obj = Path(image_path)
+        return path_obj.stem or path_obj.name
+    
+    # Extract the last path segment of the URL without building a ParseResult/Path:
+    # drop the scheme and host, then any query, fragment or ;params
+    rest = image_path.split('://', 1)[1]
+    for separator in '?#':
+        rest = rest.split(separator, 1)[0]
+    slash = rest.find('/')
+    path = rest[slash:] if slash != -1 else ''
+    head, _, last = path.rpartition('/')
+    if ';' in last:
+        path = f"{head}/{last.split(';', 1)[0]}"
+    name = path.rstrip('/').rsplit('/', 1)[-1]
+    # Same rule as Path.stem: a leading or trailing dot is not an extension
+    dot = name.rfind('.')
+    stem = name[:dot] if 0 < dot < len(name) - 1 else name
+    return stem or "image"
+
+
+def _copy_file_to(src_path: str, dest) -> int:
+    """
+    Copy a local file into an open binary file
+    
+    Uses os.sendfile where available so the data is copied in the kernel
+    without passing through user-space buffers.
+    
+    Args:
+        src_path: Source file path
+        dest: Destination file object opened for binary writing
+        
+    Returns:
+        Number of bytes copied
+    """
+    with open(src_path, 'rb') as src:
+        size = os.fstat(src.fileno()).st_size
+        if hasattr(os, 'sendfile'):
+            dest.flush()
+            offset = 0
+            try:
+                while offset < size:
+                    sent = os.sendfile(dest.fileno(), src.fileno(), offset, size - offset)
+                    if not sent:
+                        break
+                    offset += sent
+                return offset
+            except OSError:
+                # sendfile can't write to regular files on this platform; fall back
+                # to a buffered copy if nothing was copied yet
+                if offset:
+                    raise
+        shutil.copyfileobj(src, dest, DOWNLOAD_CHUNK_SIZE)
+        return dest.tell()
+
 
 def load_env_file(env_path: Optional[str] = None) -> None:
     """
@@ -49,8 +486,7 @@ def load_env_file(env_path: Optional[str] = None) -> None:
             load_dotenv(env_path)
         else:
             # Try script directory first, then current directory
-            script_dir = Path(__file__).parent.parent
-            env_file = script_dir / '.env'
+            env_file = _SCRIPT_ENV_FILE
             if not env_file.exists():
                 env_file = Path.cwd() / '.env'
             if env_file.exists():
@@ -62,28 +498,80 @@ def load_env_file(env_path: Optional[str] = None) -> None:
         if env_path:
             env_file = Path(env_path)
         else:
-            script_dir = Path(__file__).parent.parent
-            env_file = script_dir / '.env'
+            env_file = _SCRIPT_ENV_FILE
             if not env_file.exists():
                 env_file = Path.cwd() / '.env'
         
         if env_file.exists():
-            with open(env_file, 'r') as f:
-                for line in f:
-                    line = line.strip()
-                    if line and not line.startswith('#') and '=' in line:
-                        key, value = line.split('=', 1)
-                        key = key.strip()
-                        value = value.strip().strip('"').strip("'")
-                        # Only set if not already in environment
-                        if key and key not in os.environ:
-                            os.environ[key] = value
+            for key, value in _parse_env_file(env_file).items():
+                # Only set if not already in environment
+                os.environ.setdefault(key, value)
+
+
+def read_env_file(env_path: str) -> Dict[str, str]:
+    """
+    Read variables from a .env file without changing the environment
+    
+    Args:
+        env_path: Path to .env file
+        
+    Returns:
+        Variables defined in the file (empty if the file does not exist)
+    """
+    if _dotenv_available:
+        return {key: value for key, value in dotenv_values(env_path).items() if value is not None}
+    env_file = Path(env_path)
+    if not env_file.exists():
+        return {}
+    return _parse_env_file(env_file)
+
+
+def _parse_env_file(env_file: Path) -> Dict[str, str]:
+    """
+    Parse a .env file with the manual parser (basic support)
+    
+    Args:
+        env_file: Path to an existing .env file
+        
+    Returns:
+        Variables defined in the file
+    """
+    values = {}
+    for match in _ENV_LINE_RE.finditer(env_file.read_bytes()):
+        key, double_quoted, single_quoted, bare = match.groups()
+        if double_quoted is not None:
+            value = double_quoted
+        elif single_quoted is not None:
+            value = single_quoted
+        else:
+            value = bare
+        # First assignment wins, as when loading into the environment
+        values.setdefault(key.decode('utf-8'), value.decode('utf-8'))
+    return values
 
 
 class GeminiVideoService:
     """Core service for interacting with Google Gemini Veo 3.1 API"""
     
-    def __init__(self, api_key: Optional[str] = None, base_url: Optional[str] = None, verbose: bool = False):
+    # Progress spinner frames shown while polling (pre-encoded, written to stderr as bytes)
+    SPINNER_FRAMES = tuple(f"\r{frame}".encode('utf-8') for frame in (
+        "🎬 Generating video",
+        "🎥 Creating magic",
+        "✨ Crafting frames",
+        "🎞️  Processing scenes",
+        "🎭 Building story",
+        "🎨 Adding effects",
+        "🌟 Finalizing"
+    ))
+    
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        base_url: Optional[str] = None,
+        verbose: bool = False,
+        session: Optional['requests.Session'] = None,
+        quiet: bool = False
+    ):
         """
         Initialize the video service
         
@@ -91,22 +579,36 @@ class GeminiVideoService:
             api_key: Google Gemini API key (if not provided, will be read from GEMINI_API_KEY environment variable)
             base_url: Base URL for API (if not provided, will be read from GOOGLE_API_DOMAIN env var or default to production)
             verbose: Enable verbose debug output
+            session: HTTP session for all requests (defaults to the shared session from get_session())
+            quiet: Don't write console progress (spinner, redirect notes) to stderr
         """
+        self._session = session
         self.api_key = api_key or os.getenv('GEMINI_API_KEY') or ''
         
         # Get base URL from parameter, env var, or default to production
-        if base_url:
-            self.base_url = base_url.rstrip('/')
-        else:
-            env_base_url = os.getenv('GOOGLE_API_DOMAIN')
-            if env_base_url:
-                self.base_url = env_base_url.rstrip('/')
-            else:
-                # Default to production API
-                self.base_url = 'https://generativelanguage.googleapis.com/v1beta'
+        self.base_url = (base_url or os.getenv('GOOGLE_API_DOMAIN') or DEFAULT_API_BASE_URL).rstrip('/')
         
-        self.model_name = 'veo-3.1-generate-preview'
+        self.model_name = DEFAULT_VIDEO_MODEL
         self.verbose = verbose
+        self.quiet = quiet
+        # Debug logger chosen once so message sites don't re-check verbose
+        self._log = _log_stderr if verbose else _noop
+        # The progress spinner replaces debug output on the console
+        self._show_progress = not verbose and not quiet
+        
+        # Request headers are the same for every call, build them once
+        self._auth_headers = {
+            'x-goog-api-key': self.api_key
+        }
+        self._json_headers = {
+            'x-goog-api-key': self.api_key,
+            'Content-Type': 'application/json'
+        }
+    
+    @property
+    def session(self) -> 'requests.Session':
+        """HTTP session used for API calls and downloads"""
+        return self._session if self._session is not None else get_session()
     
     def is_available(self) -> bool:
         """Check if the service is available"""
@@ -143,23 +645,30 @@ class GeminiVideoService:
                 'Gemini video service is not available. Please configure the Gemini API key.'
             )
         
-        import base64
-        
         endpoint = f"{self.base_url}/models/{self.model_name}:predictLongRunning"
         
+        # Base64-encode the images as bytes. The payload is serialized with short
+        # placeholders and the encoded images are spliced into the JSON body
+        # afterwards, so the (large) base64 data is never decoded to str or
+        # re-scanned by the JSON encoder (the base64 alphabet needs no escaping).
+        placeholder_prefix = f'@image-{uuid.uuid4().hex}-'
+        encoded_images = {'image': _b64.b64encode(image_data)}
+        if second_image_data and second_mime_type:
+            encoded_images['image2'] = _b64.b64encode(second_image_data)
+        
         # Prepare payload with first image
         instance_data = {
             'prompt': prompt,
             'image': {
-                'bytesBase64Encoded': base64.b64encode(image_data).decode('utf-8'),
+                'bytesBase64Encoded': f'{placeholder_prefix}image',
                 'mimeType': mime_type
             }
         }
         
         # Add second image if provided
-        if second_image_data and second_mime_type:
+        if 'image2' in encoded_images:
             instance_data['image2'] = {
-                'bytesBase64Encoded': base64.b64encode(second_image_data).decode('utf-8'),
+                'bytesBase64Encoded': f'{placeholder_prefix}image2',
                 'mimeType': second_mime_type
             }
         
@@ -186,27 +695,34 @@ class GeminiVideoService:
                 print(f"Image 2 - Size: {len(second_image_data)} bytes, MIME: {second_mime_type}", file=sys.stderr)
             print(f"Aspect Ratio: {aspect_ratio}", file=sys.stderr)
             print("\nRequest Payload:", file=sys.stderr)
-            # Create a copy of payload for display (truncate base64 data)
-            debug_payload = json.loads(json.dumps(payload))
-            if 'instances' in debug_payload and len(debug_payload['instances']) > 0:
-                instance = debug_payload['instances'][0]
-                if 'image' in instance:
-                    img_data = instance['image']['bytesBase64Encoded']
-                    instance['image']['bytesBase64Encoded'] = f"{img_data[:50]}... (truncated, {len(img_data)} chars total)"
-                if 'image2' in instance:
-                    img2_data = instance['image2']['bytesBase64Encoded']
-                    instance['image2']['bytesBase64Encoded'] = f"{img2_data[:50]}... (truncated, {len(img2_data)} chars total)"
+            # Build a display copy of the payload with truncated base64 data
+            debug_instance = dict(instance_data)
+            for key, encoded in encoded_images.items():
+                debug_instance[key] = {
+                    **instance_data[key],
+                    'bytesBase64Encoded': f"{encoded[:50].decode('ascii')}... (truncated, {len(encoded)} chars total)"
+                }
+            debug_payload = {
+                'instances': [debug_instance],
+                'parameters': payload['parameters']
+            }
             print(json.dumps(debug_payload, indent=2), file=sys.stderr)
             print("=" * 80, file=sys.stderr)
         
-        # Make API request
-        headers = {
-            'x-goog-api-key': self.api_key,
-            'Content-Type': 'application/json'
-        }
+        # Serialize, then replace each placeholder with its encoded image
+        body = _dump_json(payload)
+        parts = []
+        for key, encoded in encoded_images.items():
+            head, body = body.split(f'{placeholder_prefix}{key}'.encode('ascii'), 1)
+            parts += (head, encoded)
+        parts.append(body)
+        body = b''.join(parts)
         
+        import requests
+        
+        # Make API request
         try:
-            response = requests.post(endpoint, json=payload, headers=headers, timeout=60)
+            response = self.session.post(endpoint, data=body, headers=self._json_headers, timeout=60)
             
             if self.verbose:
                 print("\n[API Response] Status Code:", response.status_code, file=sys.stderr)
@@ -243,18 +759,20 @@ class GeminiVideoService:
                         print(f"[API Error] Response Body (raw): {e.response.text[:500]}", file=sys.stderr)
             raise RuntimeError(f'Gemini API request failed: {str(e)}')
         except Exception as e:
-            if self.verbose:
-                print(f"\n[API Error] Exception: {str(e)}", file=sys.stderr)
+            self._log(f"\n[API Error] Exception: {str(e)}")
             raise RuntimeError(f'Video generation failed: {str(e)}')
     
     def poll_operation_status(self, operation_name: str, max_wait_seconds: int = 300, poll_interval_seconds: int = 10) -> Dict[str, Any]:
         """
         Poll operation status until completion
         
+        Polls start 1 second apart and back off exponentially up to
+        poll_interval_seconds.
+        
         Args:
             operation_name: Operation name/ID
             max_wait_seconds: Maximum time to wait in seconds
-            poll_interval_seconds: Interval between polls in seconds
+            poll_interval_seconds: Maximum interval between polls in seconds
             
         Returns:
             Operation response data
@@ -265,49 +783,37 @@ class GeminiVideoService:
         if not self.is_available():
             raise RuntimeError('Gemini video service is not available.')
         
+        import requests
+        
         poll_url = f"{self.base_url}/{operation_name}"
-        headers = {
-            'x-goog-api-key': self.api_key
-        }
         
-        start_time = time.time()
-        spinner_frames = [
-            "🎬 Generating video",
-            "🎥 Creating magic",
-            "✨ Crafting frames",
-            "🎞️  Processing scenes",
-            "🎭 Building story",
-            "🎨 Adding effects",
-            "🌟 Finalizing"
-        ]
+        start_time = time.monotonic()
+        intervals = _backoff_intervals(min(1.0, poll_interval_seconds), poll_interval_seconds)
         spinner_idx = 0
         last_spinner_time = start_time
         
         # Show initial message
-        if not self.verbose:
+        if self._show_progress:
             print("🎬 Starting video generation...", file=sys.stderr, end='', flush=True)
         
         while True:
             # Check timeout
-            elapsed = time.time() - start_time
+            current_time = time.monotonic()
+            elapsed = current_time - start_time
             if elapsed > max_wait_seconds:
-                if not self.verbose:
+                if self._show_progress:
                     print("\n", file=sys.stderr, end='')
                 raise RuntimeError(f'Video generation timeout after {max_wait_seconds} seconds')
             
             # Update spinner animation (every 0.8 seconds, only if not verbose)
-            if not self.verbose:
-                current_time = time.time()
-                if current_time - last_spinner_time >= 0.8:
-                    spinner_msg = spinner_frames[spinner_idx % len(spinner_frames)]
-                    elapsed_str = f" ({int(elapsed)}s)"
-                    print(f"\r{spinner_msg}{elapsed_str}", file=sys.stderr, end='', flush=True)
-                    spinner_idx += 1
-                    last_spinner_time = current_time
+            if self._show_progress and current_time - last_spinner_time >= 0.8:
+                self._write_spinner(spinner_idx, elapsed)
+                spinner_idx += 1
+                last_spinner_time = current_time
             
             # Poll operation status
             try:
-                response = requests.get(poll_url, headers=headers, timeout=poll_interval_seconds + 5)
+                response = self.session.get(poll_url, headers=self._auth_headers, timeout=poll_interval_seconds + 5)
                 
                 # Debug output for polling
                 if self.verbose:
@@ -330,7 +836,7 @@ class GeminiVideoService:
                 
                 # Check if operation is done
                 if data.get('done', False):
-                    if not self.verbose:
+                    if self._show_progress:
                         print("\r✅ Video generation complete!" + " " * 20, file=sys.stderr)
                     if self.verbose:
                         print("\n[Poll Complete] Final Response:", file=sys.stderr)
@@ -338,23 +844,22 @@ class GeminiVideoService:
                     return data
                 
                 # Not done yet, wait and poll again
+                interval = next(intervals)
                 # During sleep, continue showing spinner animation if not verbose
-                if not self.verbose:
-                    sleep_interval = 0.5  # Update spinner every 0.5 seconds
-                    slept = 0
-                    while slept < poll_interval_seconds:
-                        time.sleep(sleep_interval)
-                        slept += sleep_interval
-                        elapsed = time.time() - start_time
-                        current_time = time.time()
+                if self._show_progress:
+                    deadline = time.monotonic() + interval
+                    while True:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        time.sleep(min(0.5, remaining))  # Update spinner every 0.5 seconds
+                        current_time = time.monotonic()
                         if current_time - last_spinner_time >= 0.8:
-                            spinner_msg = spinner_frames[spinner_idx % len(spinner_frames)]
-                            elapsed_str = f" ({int(elapsed)}s)"
-                            print(f"\r{spinner_msg}{elapsed_str}", file=sys.stderr, end='', flush=True)
+                            self._write_spinner(spinner_idx, current_time - start_time)
                             spinner_idx += 1
                             last_spinner_time = current_time
                 else:
-                    time.sleep(poll_interval_seconds)
+                    time.sleep(interval)
                 
             except requests.RequestException as e:
                 if self.verbose:
@@ -367,6 +872,26 @@ class GeminiVideoService:
                             print(f"[Poll Error] Response Body (raw): {e.response.text[:500]}", file=sys.stderr)
                 raise RuntimeError(f'Video operation polling failed: {str(e)}')
     
+    def _write_spinner(self, frame_idx: int, elapsed: float) -> None:
+        """
+        Write one spinner frame with elapsed time to stderr
+        
+        Frames are pre-encoded and written straight to the binary stream with a
+        single flush, skipping print() and the text wrapper on every tick.
+        
+        Args:
+            frame_idx: Spinner frame counter
+            elapsed: Seconds since polling started
+        """
+        frame = self.SPINNER_FRAMES[frame_idx % len(self.SPINNER_FRAMES)] + b' (%ds)' % int(elapsed)
+        stream = getattr(sys.stderr, 'buffer', None)
+        if stream is None:
+            # stderr replaced by a text-only stream (e.g. captured output)
+            print(frame.decode('utf-8'), file=sys.stderr, end='', flush=True)
+            return
+        stream.write(frame)
+        stream.flush()
+    
     def extract_video_uri(self, operation_data: Dict[str, Any]) -> str:
         """
         Extract video URI from completed operation response
@@ -409,65 +934,132 @@ class GeminiVideoService:
         
         raise RuntimeError('No video URI found in completed operation response')
     
-    def download_video(self, video_uri: str) -> bytes:
+    def download_video(self, video_uri: str, dest_path: Union[str, Path]) -> int:
         """
         Download video from URI with proper 302 redirect handling
         
+        The response body is streamed to disk in chunks so large videos are
+        never held in memory as a whole, and renamed into place atomically once
+        complete. file:// URIs are copied locally.
+        
         Args:
             video_uri: Video download URI
+            dest_path: File path the video is written to
             
         Returns:
-            Video content as bytes
+            Number of bytes written
             
         Raises:
             RuntimeError: If download fails
         """
-        headers = {
-            'x-goog-api-key': self.api_key
-        }
-        
         # Append API key to URI if it's a Google API URI and doesn't have it
-        if 'generativelanguage.googleapis.com' in video_uri and 'key=' not in video_uri:
-            separator = '&' if '?' in video_uri else '?'
-            video_uri = f"{video_uri}{separator}key={self.api_key}"
+        # (existing query parameters are kept as-is rather than re-encoded)
+        parts = urlsplit(video_uri)
+        if parts.hostname == GOOGLE_API_HOST and not any(
+            name == 'key' for name, _ in parse_qsl(parts.query, keep_blank_values=True)
+        ):
+            key_param = urlencode({'key': self.api_key})
+            query = f"{parts.query}&{key_param}" if parts.query else key_param
+            video_uri = urlunsplit(parts._replace(query=query))
+        
+        # Local file URIs (e.g. videos staged on a shared volume) are copied in-kernel
+        if parts.scheme == 'file':
+            return self._write_atomically(
+                dest_path, lambda f: _copy_file_to(unquote(parts.path), f)
+            )
         
-        # Use requests with redirect following
-        response = requests.get(
+        # Use shared session with redirect following
+        with self.session.get(
             video_uri,
-            headers=headers,
+            headers=self._auth_headers,
             allow_redirects=True,
             timeout=300,  # 5 minutes for large video files
             stream=True
-        )
-        
-        # Check for redirects (requests handles automatically, but log for debugging)
-        if response.history:
-            redirect_count = len(response.history)
-            final_url = response.url
-            print(f"Followed {redirect_count} redirect(s), final URL: {final_url}", file=sys.stderr)
-        
-        # Raise exception for non-2xx status codes
-        response.raise_for_status()
+        ) as response:
+            # Check for redirects (requests handles automatically, but log for debugging)
+            if response.history and not self.quiet:
+                redirect_count = len(response.history)
+                final_url = response.url
+                print(f"Followed {redirect_count} redirect(s), final URL: {final_url}", file=sys.stderr)
+            
+            # Raise exception for non-2xx status codes
+            response.raise_for_status()
+            
+            def write_body(f) -> int:
+                size = 0
+                for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                    f.write(chunk)
+                    size += len(chunk)
+                return size
+            
+            return self._write_atomically(dest_path, write_body)
+    
+    @staticmethod
+    def _write_atomically(dest_path: Union[str, Path], write: Callable[[Any], int]) -> int:
+        """
+        Write a video to a temp file in the destination directory, then rename it into place
         
-        # Read content
-        video_content = response.content
+        dest_path never exists as a partially written file. The temp file is opened
+        with 'xb' rather than mkstemp so it gets umask permissions.
         
-        if not video_content:
-            raise RuntimeError("Video download returned empty content")
+        Args:
+            dest_path: File path the video is written to
+            write: Callable writing the content to the open file, returning the byte count
+            
+        Returns:
+            Number of bytes written
+            
+        Raises:
+            RuntimeError: If no content was written
+        """
+        dest_path = Path(dest_path)
+        tmp_path = dest_path.with_name(f'.{dest_path.name}.{uuid.uuid4().hex}.tmp')
+        try:
+            f = open(tmp_path, 'xb')
+        except FileNotFoundError:
+            # The directory was removed since it was created (long-running processes
+            # only create it once): recreate it rather than lose the generated video
+            dest_path.parent.mkdir(parents=True, exist_ok=True)
+            f = open(tmp_path, 'xb')
+        try:
+            with f:
+                size = write(f)
+                
+                if not size:
+                    raise RuntimeError("Video download returned empty content")
+                
+                f.flush()
+                os.fsync(f.fileno())
+            
+            os.replace(tmp_path, dest_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
         
-        return video_content
+        return size
 
 
 class GeminiVideoGenerator:
     """Generate videos using Google Gemini Veo 3.1 API"""
     
+    # Video directories already created in this process
+    _ensured_dirs: set = set()
+    
+    # HTML snippet returned as embedUrl for completed videos
+    _EMBED_TEMPLATE = (
+        '<video controls width="100%" height="auto"><source src="{video_url}" type="video/mp4">'
+        'Your browser does not support the video tag.</video>'
+    )
+    
     def __init__(
         self,
         api_key: Optional[str] = None,
         base_path: Optional[str] = None,
         base_url: Optional[str] = None,
         save_path: Optional[str] = None,
-        verbose: bool = False
+        verbose: bool = False,
+        session: Optional['requests.Session'] = None,
+        quiet: bool = False
     ):
         """
         Initialize the video generator
@@ -478,58 +1070,61 @@ class GeminiVideoGenerator:
             base_url: Base URL for generating full video URLs (defaults to MAGENTO_BASE_URL env)
             save_path: Path where videos should be saved (relative to base_path or absolute, defaults to pub/media/video)
             verbose: Enable verbose debug output
+            session: HTTP session for API calls and downloads (defaults to the shared session)
+            quiet: Don't write console progress to stderr
         """
         self.api_key = api_key or os.getenv('GEMINI_API_KEY') or ''
         
         # Resolve base_path: arg > env > current directory
         if base_path:
-            self.base_path = Path(base_path).resolve()
+            self.base_path = Path(base_path).absolute()
         else:
             env_base_path = os.getenv('MAGENTO_BASE_PATH')
             if env_base_path:
-                self.base_path = Path(env_base_path).resolve()
+                self.base_path = Path(env_base_path).absolute()
             else:
                 self.base_path = Path.cwd()
         
-        # Resolve save_path: arg > env > default (pub/media/video)
-        if save_path:
-            save_path_obj = Path(save_path)
-            if save_path_obj.is_absolute():
-                self.video_dir = save_path_obj
-            else:
-                # Relative to base_path
-                self.video_dir = self.base_path / save_path
-        else:
-            env_save_path = os.getenv('VIDEO_SAVE_PATH')
-            if env_save_path:
-                save_path_obj = Path(env_save_path)
-                if save_path_obj.is_absolute():
-                    self.video_dir = save_path_obj
-                else:
-                    self.video_dir = self.base_path / env_save_path
-            else:
-                # Default: pub/media/video (matches PHP implementation)
-                self.video_dir = self.base_path / 'pub' / 'media' / 'video'
+        # Resolve save_path: arg > env > default (pub/media/video, matches PHP implementation)
+        # Joining onto base_path keeps absolute save paths as they are
+        save_path = save_path or os.getenv('VIDEO_SAVE_PATH') or 'pub/media/video'
+        self.video_dir = self.base_path / save_path
         
-        self.video_dir.mkdir(parents=True, exist_ok=True)
+        # Create the video directory once per process
+        if self.video_dir not in GeminiVideoGenerator._ensured_dirs:
+            self.video_dir.mkdir(parents=True, exist_ok=True)
+            GeminiVideoGenerator._ensured_dirs.add(self.video_dir)
         
-        # Get base URL for generating full video URLs
-        # Base URL is optional - only needed for generating full video URLs in response
+        # URL path prefix of the video directory relative to base_path, computed once
+        # ('' if video_dir is not under base_path: video URLs then use the filename only)
+        try:
+            relative_dir = self.video_dir.relative_to(self.base_path).as_posix()
+            self._relative_video_dir = '' if relative_dir == '.' else f'{relative_dir}/'
+        except ValueError:
+            self._relative_video_dir = ''
+        
+        # Base URL for generating full video URLs is optional; when not given it is
+        # detected from the environment on first use (see the base_url property)
         if base_url:
             self.base_url = base_url.rstrip('/')
-        else:
-            try:
-                self.base_url = self._get_base_url()
-            except RuntimeError:
-                # Base URL is optional - use None if not available
-                # Will use relative path in video URL if base_url is None
-                self.base_url = None
         
         # Initialize video service (will get API key from env if not provided)
         # Pass None if empty string so service can try to get from env
         service_api_key = self.api_key if self.api_key else None
         self.verbose = verbose
-        self.video_service = GeminiVideoService(api_key=service_api_key, verbose=self.verbose)
+        self._log = _log_stderr if verbose else _noop
+        self.video_service = GeminiVideoService(
+            api_key=service_api_key, verbose=self.verbose, session=session, quiet=quiet
+        )
+        
+        # Last validator seen per URL image (see _probe_url), least recently used first
+        self._url_validators: 'OrderedDict[str, str]' = OrderedDict()
+        self._url_validator_lock = threading.Lock()
+        
+        # Content cache keys of URL inputs already seen (raw inputs -> (cache key, expiry)),
+        # least recently used first
+        self._input_keys: 'OrderedDict[tuple, tuple[str, float]]' = OrderedDict()
+        self._input_key_lock = threading.Lock()
     
     def is_available(self) -> bool:
         """Check if the service is available"""
@@ -545,36 +1140,42 @@ class GeminiVideoGenerator:
         Returns:
             Relative path string (e.g., "media/video/filename.mp4")
         """
-        video_file_path = self.video_dir / filename
-        try:
-            # Calculate relative path from base_path to video file
-            relative_path = video_file_path.relative_to(self.base_path)
-            # Convert to forward-slash path for URLs
-            return str(relative_path).replace('\\', '/')
-        except ValueError:
-            # If video_dir is not under base_path, use absolute path or just filename
-            # In this case, we'll use the filename only (less ideal but works)
-            return filename
+        return f'{self._relative_video_dir}{filename}'
+    
+    def _build_video_url(self, filename: str) -> str:
+        """
+        Build the URL of a video file in the video directory
+        
+        Args:
+            filename: Video filename
+            
+        Returns:
+            Full URL if a base URL is known, otherwise a root-relative URL
+        """
+        # base_url is stored without a trailing slash
+        return f"{self.base_url or ''}/{self._relative_video_dir}{filename}"
+    
+    @functools.cached_property
+    def base_url(self) -> Optional[str]:
+        """
+        Base URL for generating full video URLs, detected from the environment on first access
+        
+        Returns:
+            Base URL, or None to use relative video URLs
+        """
+        return self._get_base_url()
     
-    def _get_base_url(self) -> str:
+    def _get_base_url(self) -> Optional[str]:
         """
         Get base URL for generating full video URLs
         
         Returns:
-            Base URL (e.g., https://example.com)
-            
-        Raises:
-            RuntimeError: If base URL cannot be determined
+            Base URL (e.g., https://example.com), or None if it cannot be determined
         """
         # Try environment variables
         base_url = os.getenv('MAGENTO_BASE_URL') or os.getenv('BASE_URL')
         if base_url:
-            # Remove trailing slash and store code if present
-            base_url = base_url.rstrip('/')
-            # Remove store code (e.g., /default/)
-            if '/default/' in base_url:
-                base_url = base_url.replace('/default/', '/')
-            return base_url.rstrip('/')
+            return normalize_base_url(base_url)
         
         # Try to detect from system environment variables
         # Check if we can determine from HTTP_HOST
@@ -588,41 +1189,107 @@ class GeminiVideoGenerator:
         # This allows the script to work with external URLs without requiring base URL
         return None
     
-    def is_url(self, path_or_url: str) -> bool:
+    # Kept as a method for callers of the public API; internally the module-level function is used
+    is_url = staticmethod(is_url)
+    
+    def download_image_from_url(self, url: str) -> tuple[bytes, str]:
         """
-        Check if the input is a URL
+        Download image from URL
         
         Args:
-            path_or_url: Path or URL string
+            url: Image URL
             
         Returns:
-            True if URL, False otherwise
+            Tuple of (image_data, mime_type)
         """
-        return path_or_url.startswith(('http://', 'https://'))
+        import requests
+        
+        try:
+            # Stream the body so oversized images are rejected without reading them fully
+            with self.video_service.session.get(url, timeout=30, stream=True) as response:
+                response.raise_for_status()
+                
+                content_length = response.headers.get('Content-Length')
+                expected = int(content_length) if content_length and content_length.isdigit() else 0
+                if expected > MAX_IMAGE_BYTES:
+                    raise RuntimeError(
+                        f"Image at {url} is too large ({content_length} bytes, max {MAX_IMAGE_BYTES})"
+                    )
+                
+                # Collect chunks and join them once: a single copy into immutable bytes,
+                # which are safe to share through the image cache
+                chunks = []
+                received = 0
+                for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                    received += len(chunk)
+                    if received > MAX_IMAGE_BYTES:
+                        raise RuntimeError(f"Image at {url} is too large (max {MAX_IMAGE_BYTES} bytes)")
+                    chunks.append(chunk)
+                image_data = b''.join(chunks)
+                del chunks
+                
+                # Determine MIME type from Content-Type header or URL
+                mime_type = response.headers.get('Content-Type', '').split(';')[0].strip()
+                if not mime_type or mime_type == 'application/octet-stream':
+                    mime_type = _EXT_MIME.get(os.path.splitext(urlparse(url).path)[1].lower(), 'image/jpeg')
+            
+            return image_data, mime_type
+        except requests.RequestException as e:
+            raise RuntimeError(f"Failed to download image from URL {url}: {str(e)}")
     
-    def download_image_from_url(self, url: str) -> tuple[bytes, str]:
+    def _probe_url(self, url: str) -> Optional[str]:
         """
-        Download image from URL
+        Get a validator identifying the current version of a URL image without downloading it
         
         Args:
             url: Image URL
             
         Returns:
-            Tuple of (image_data, mime_type)
+            Validator built from the ETag/Last-Modified/Content-Length headers of a
+            HEAD request, or None if the server provides no ETag or Last-Modified
         """
+        import requests
+        
         try:
-            response = requests.get(url, timeout=30)
-            response.raise_for_status()
-            
-            # Determine MIME type from Content-Type header or URL
-            mime_type = response.headers.get('Content-Type', '').split(';')[0].strip()
-            if not mime_type or mime_type == 'application/octet-stream':
-                mime_type, _ = mimetypes.guess_type(url)
-                mime_type = mime_type or 'image/jpeg'
+            response = self.video_service.session.head(url, allow_redirects=True, timeout=10)
+        except requests.RequestException:
+            return None
+        if not response.ok:
+            return None
+        
+        headers = response.headers
+        etag = headers.get('ETag', '')
+        last_modified = headers.get('Last-Modified', '')
+        if not etag and not last_modified:
+            return None
+        validator = f"{etag}|{last_modified}|{headers.get('Content-Length', '')}"
+        # Loads of this URL must not be served from image data older than the validator
+        with self._url_validator_lock:
+            self._url_validators[url] = validator
+            self._url_validators.move_to_end(url)
+            while len(self._url_validators) > URL_MEMO_SIZE:
+                self._url_validators.popitem(last=False)
+        return validator
+    
+    def _get_url_image(self, url: str) -> tuple[bytes, str]:
+        """
+        Get image data for a URL, downloading it only on first use
+        
+        Args:
+            url: Image URL
             
-            return response.content, mime_type
-        except requests.RequestException as e:
-            raise RuntimeError(f"Failed to download image from URL {url}: {str(e)}")
+        Returns:
+            Tuple of (image_data, mime_type)
+        """
+        with self._url_validator_lock:
+            validator = self._url_validators.get(url)
+            if validator is not None:
+                self._url_validators.move_to_end(url)
+        # Without a validator a changed image can't be detected: only reuse it for a while
+        return _get_cached_image(
+            url, validator, lambda: self.download_image_from_url(url),
+            ttl=None if validator else URL_IMAGE_TTL
+        )
     
     def resolve_image_path(self, image_path: str) -> Optional[Path]:
         """
@@ -634,23 +1301,7 @@ class GeminiVideoGenerator:
         Returns:
             Resolved absolute path, or None if URL
         """
-        # If it's a URL, return None (will be handled separately)
-        if self.is_url(image_path):
-            return None
-        
-        image_path_obj = Path(image_path)
-        
-        # If absolute path, use as is
-        if image_path_obj.is_absolute():
-            return image_path_obj
-        
-        # If path starts with pub/media/, remove it
-        if str(image_path).startswith('pub/media/'):
-            image_path = str(image_path)[10:]
-        
-        # Resolve relative to pub/media/
-        media_path = self.base_path / 'pub' / 'media' / image_path.lstrip('/')
-        return media_path
+        return resolve_image_path(image_path, self.base_path)
     
     def generate_cache_key(self, image_path: str, prompt: str, aspect_ratio: str, second_image_path: Optional[str] = None) -> str:
         """
@@ -667,27 +1318,114 @@ class GeminiVideoGenerator:
         """
         def get_image_hash(path: str) -> str:
             """Helper to get hash of an image"""
-            if self.is_url(path):
-                image_data, _ = self.download_image_from_url(path)
-                return hashlib.md5(image_data).hexdigest()
+            if is_url(path):
+                image_data, _ = self._get_url_image(path)
+                return _new_hash(image_data).hexdigest()
             else:
-                image_path_obj = Path(path)
-                if not image_path_obj.exists():
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
                     raise FileNotFoundError(f"Image not found: {path}")
-                with open(image_path_obj, 'rb') as f:
-                    return hashlib.md5(f.read()).hexdigest()
-        
-        # Get hash of first image
-        image_hash = get_image_hash(image_path)
-        
-        # Get hash of second image if provided
-        second_image_hash = ''
-        if second_image_path:
-            second_image_hash = get_image_hash(second_image_path)
+                return _file_hash(path, stat.st_mtime_ns, stat.st_size)
+        
+        if second_image_path and second_image_path != image_path:
+            # Hash both images concurrently (downloads and file reads overlap)
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                first_future = executor.submit(get_image_hash, image_path)
+                second_future = executor.submit(get_image_hash, second_image_path)
+                image_hash = first_future.result()
+                second_image_hash = second_future.result()
+        else:
+            image_hash = get_image_hash(image_path)
+            second_image_hash = image_hash if second_image_path else ''
         
         # Create cache key from all parameters
         cache_data = f"{image_hash}:{second_image_hash}:{prompt}:{aspect_ratio}"
-        return hashlib.md5(cache_data.encode()).hexdigest()
+        return _new_hash(cache_data.encode()).hexdigest()
+    
+    def _fast_cache_key(
+        self,
+        image_path: str,
+        prompt: str,
+        aspect_ratio: str,
+        second_image_path: Optional[str] = None,
+        silent_video: bool = False,
+        auto_reference_images: bool = True
+    ) -> Optional[str]:
+        """
+        Generate a cache pre-key from image metadata (file stat or URL validators) instead of image content
+        
+        Uses the prompt as given (before enhancement), so the prompt options are part of the key.
+        
+        Args:
+            image_path: Path to image or URL
+            prompt: Video generation prompt as passed to generate_video_from_image
+            aspect_ratio: Aspect ratio
+            second_image_path: Optional path to second image or URL
+            silent_video: Whether "silent video" is appended to the prompt
+            auto_reference_images: Whether image context is added to the prompt
+            
+        Returns:
+            Pre-key string, or None if a file cannot be stat'ed or a URL has no validator
+        """
+        parts = []
+        for path in (image_path, second_image_path):
+            if not path:
+                parts.append('')
+                continue
+            if parts and path == image_path:
+                # Same image in both slots
+                parts.append(parts[0])
+                continue
+            if is_url(path):
+                validator = self._probe_url(path)
+                if validator is None:
+                    return None
+                parts.append(f"{path}:{validator}")
+                continue
+            source_path = self.resolve_image_path(path)
+            try:
+                stat = os.stat(source_path)
+            except OSError:
+                return None
+            parts.append(f"{source_path}:{stat.st_mtime_ns}:{stat.st_size}")
+        
+        key_data = f"{parts[0]}:{parts[1]}:{int(silent_video)}{int(auto_reference_images)}:{prompt}:{aspect_ratio}"
+        return _new_hash(key_data.encode()).hexdigest()
+    
+    def _fast_key_path(self, fast_key: str) -> Path:
+        """Path of the marker file mapping a pre-key to its content cache key"""
+        return self.video_dir / f'.veo_{fast_key}.key'
+    
+    def _get_fast_cached_video(self, fast_key: str) -> Optional[Dict[str, Any]]:
+        """
+        Check for a cached video via a pre-key from _fast_cache_key
+        
+        Args:
+            fast_key: Pre-key
+            
+        Returns:
+            Cached video info if exists, None otherwise
+        """
+        try:
+            cache_key = self._fast_key_path(fast_key).read_text().strip()
+        except OSError:
+            return None
+        return self.get_cached_video(cache_key) if cache_key else None
+    
+    def _save_fast_cache_key(self, fast_key: str, cache_key: str) -> None:
+        """
+        Remember which content cache key a pre-key maps to
+        
+        Args:
+            fast_key: Pre-key
+            cache_key: Content-based cache key
+        """
+        try:
+            self._fast_key_path(fast_key).write_text(cache_key)
+        except OSError:
+            # Best effort - the content-based lookup still works without it
+            pass
     
     def get_cached_video(self, cache_key: str) -> Optional[Dict[str, Any]]:
         """
@@ -703,20 +1441,9 @@ class GeminiVideoGenerator:
         video_path = self.video_dir / filename
         
         if video_path.exists():
-            # Generate video URL
-            relative_path = self._get_relative_video_path(filename)
-            
-            # If base_url is available, create full URL; otherwise use relative path
-            if self.base_url:
-                base_url_clean = self.base_url.rstrip('/')
-                video_url = f"{base_url_clean}/{relative_path}"
-            else:
-                # No base URL available, use relative path
-                video_url = f"/{relative_path}"
-            
             return {
                 'fromCache': True,
-                'videoUrl': video_url,
+                'videoUrl': self._build_video_url(filename),
                 'videoPath': str(video_path),
                 'status': 'completed'
             }
@@ -737,12 +1464,8 @@ class GeminiVideoGenerator:
         filename = f'veo_{cache_key}.mp4'
         video_path = self.video_dir / filename
         
-        # Download video using service
-        video_content = self.video_service.download_video(video_uri)
-        
-        # Save to file
-        with open(video_path, 'wb') as f:
-            f.write(video_content)
+        # Download video straight to file using service
+        self.video_service.download_video(video_uri, video_path)
         
         return str(video_path)
     
@@ -756,42 +1479,43 @@ class GeminiVideoGenerator:
         Returns:
             Tuple of (image_data, mime_type, source_path_str)
         """
-        if self.verbose:
-            print(f"\n[Image Processing] Loading: {image_path}", file=sys.stderr)
+        self._log(f"\n[Image Processing] Loading: {image_path}")
         
-        if self.is_url(image_path):
+        if is_url(image_path):
             # Download image from URL
-            if self.verbose:
-                print(f"  Type: External URL", file=sys.stderr)
-            image_data, mime_type = self.download_image_from_url(image_path)
+            self._log(f"  Type: External URL")
+            image_data, mime_type = self._get_url_image(image_path)
             source_path_str = image_path  # Keep URL for reference
-            if self.verbose:
-                print(f"  Downloaded: {len(image_data)} bytes", file=sys.stderr)
-                print(f"  MIME Type: {mime_type}", file=sys.stderr)
+            self._log(f"  Downloaded: {len(image_data)} bytes")
+            self._log(f"  MIME Type: {mime_type}")
         else:
             # Resolve image path
             source_path = self.resolve_image_path(image_path)
-            if source_path is None or not source_path.exists():
+            try:
+                stat = os.stat(source_path) if source_path is not None else None
+            except OSError:
+                stat = None
+            if stat is None:
                 raise FileNotFoundError(f"Source image not found: {image_path}")
             
-            if self.verbose:
-                print(f"  Type: Local file", file=sys.stderr)
-                print(f"  Resolved path: {source_path}", file=sys.stderr)
-            
-            # Read image file
-            with open(source_path, 'rb') as f:
-                image_data = f.read()
+            self._log(f"  Type: Local file")
+            self._log(f"  Resolved path: {source_path}")
             
-            if self.verbose:
-                print(f"  File size: {len(image_data)} bytes", file=sys.stderr)
+            def read_image() -> tuple[bytes, str]:
+                with open(source_path, 'rb') as f:
+                    data = f.read()
+                # Default to JPEG for unknown extensions
+                return data, _EXT_MIME.get(source_path.suffix.lower(), 'image/jpeg')
             
-            # Determine MIME type using Python's mimetypes library (more robust)
-            mime_type, _ = mimetypes.guess_type(str(source_path))
-            mime_type = mime_type or 'image/jpeg'  # Default to JPEG if detection fails
+            # Read image file (cached until its mtime or size changes)
             source_path_str = str(source_path)
+            image_data, mime_type = _get_cached_image(
+                source_path_str, (stat.st_mtime_ns, stat.st_size), read_image
+            )
             
-            if self.verbose:
-                print(f"  MIME Type: {mime_type}", file=sys.stderr)
+            self._log(f"  File size: {len(image_data)} bytes")
+            
+            self._log(f"  MIME Type: {mime_type}")
         
         return image_data, mime_type, source_path_str
     
@@ -805,16 +1529,7 @@ class GeminiVideoGenerator:
         Returns:
             Reference name (e.g., "background.jpg", "summer_scene")
         """
-        if self.is_url(image_path):
-            # Extract filename from URL
-            parsed = urlparse(image_path)
-            filename = Path(parsed.path).stem or "image"
-        else:
-            # Get filename from path (with extension for clarity)
-            path_obj = Path(image_path)
-            filename = path_obj.stem or path_obj.name
-        
-        return filename
+        return _image_reference_name(image_path)
     
     def _enhance_prompt_with_image_references(
         self,
@@ -833,8 +1548,9 @@ class GeminiVideoGenerator:
             auto_reference: If True, automatically add image context to prompt
             
         Returns:
-            Enhanced prompt with image references
+            Enhanced prompt with image references (always stripped of surrounding whitespace)
         """
+        prompt = prompt.strip()
         if not auto_reference or not second_image_path:
             return prompt
         
@@ -843,11 +1559,10 @@ class GeminiVideoGenerator:
         image2_name = self._get_image_reference_name(second_image_path)
         
         # Check if prompt already contains image references
-        prompt_lower = prompt.lower()
-        has_reference = any(keyword in prompt_lower for keyword in [
-            'image1', 'image2', 'first image', 'second image',
-            'image 1', 'image 2', image1_name.lower(), image2_name.lower()
-        ])
+        has_reference = bool(_IMAGE_REF_RE.search(prompt))
+        if not has_reference:
+            prompt_lower = prompt.lower()
+            has_reference = image1_name.lower() in prompt_lower or image2_name.lower() in prompt_lower
         
         # If prompt already references images, return as-is
         if has_reference:
@@ -858,7 +1573,7 @@ class GeminiVideoGenerator:
         # This helps the AI understand which image corresponds to which reference in the prompt
         enhanced_prompt = (
             f"Context: You have two images - '{image1_name}' (image1/first image) and "
-            f"'{image2_name}' (image2/second image). {prompt.strip()}"
+            f"'{image2_name}' (image2/second image). {prompt}"
         )
         
         return enhanced_prompt
@@ -897,15 +1612,27 @@ class GeminiVideoGenerator:
                 'Gemini video service is not available. Please configure the Gemini API key.'
             )
         
-        # Load first image
-        image_data, mime_type, source_path_str = self._load_image(image_path)
-        
-        # Load second image if provided
-        second_image_data = None
-        second_mime_type = None
-        second_source_path_str = None
-        if second_image_path:
-            second_image_data, second_mime_type, second_source_path_str = self._load_image(second_image_path)
+        # Check cache before any prompt processing or image loading so warm reruns
+        # skip both: images are keyed by file metadata or URL validators (persisted
+        # next to the videos); URL images without validators by the raw inputs for
+        # URL_IMAGE_TTL seconds (as is their image data, see _get_url_image)
+        fast_key = self._fast_cache_key(
+            image_path, prompt, aspect_ratio, second_image_path, silent_video, auto_reference_images
+        )
+        input_key = None
+        cached_video = None
+        if fast_key:
+            cached_video = self._get_fast_cached_video(fast_key)
+        elif is_url(image_path) and (not second_image_path or is_url(second_image_path)):
+            input_key = (image_path, prompt, aspect_ratio, silent_video, second_image_path, auto_reference_images)
+            with self._input_key_lock:
+                known_cache_key, expires = self._input_keys.get(input_key, (None, 0.0))
+                if known_cache_key:
+                    self._input_keys.move_to_end(input_key)
+            if known_cache_key and expires > time.monotonic():
+                cached_video = self.get_cached_video(known_cache_key)
+        if cached_video:
+            return cached_video
         
         # Enhance prompt with image references if second image is provided
         original_prompt = prompt
@@ -926,9 +1653,24 @@ class GeminiVideoGenerator:
         
         # Append "silent video" to prompt if requested
         if silent_video:
-            final_prompt = f"{final_prompt.strip()} silent video"
-            if self.verbose:
-                print(f"Added 'silent video': {final_prompt}", file=sys.stderr)
+            final_prompt += ' silent video'  # already stripped by the enhancement step
+            self._log(f"Added 'silent video': {final_prompt}")
+        
+        # Load first image, and second image concurrently if provided
+        second_image_data = None
+        second_mime_type = None
+        second_source_path_str = None
+        if second_image_path and second_image_path != image_path:
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                first_future = executor.submit(self._load_image, image_path)
+                second_future = executor.submit(self._load_image, second_image_path)
+                image_data, mime_type, source_path_str = first_future.result()
+                second_image_data, second_mime_type, second_source_path_str = second_future.result()
+        else:
+            image_data, mime_type, source_path_str = self._load_image(image_path)
+            if second_image_path:
+                # Same image in both slots: reuse the first load
+                second_image_data, second_mime_type, second_source_path_str = image_data, mime_type, source_path_str
         
         # Generate cache key (include second image if provided)
         cache_key = self.generate_cache_key(
@@ -937,6 +1679,15 @@ class GeminiVideoGenerator:
             aspect_ratio,
             second_source_path_str if second_image_path else None
         )
+        if fast_key:
+            self._save_fast_cache_key(fast_key, cache_key)
+        elif input_key:
+            with self._input_key_lock:
+                # These URLs can't be revalidated: expire like their cached image data
+                self._input_keys[input_key] = (cache_key, time.monotonic() + URL_IMAGE_TTL)
+                self._input_keys.move_to_end(input_key)
+                while len(self._input_keys) > URL_MEMO_SIZE:
+                    self._input_keys.popitem(last=False)
         
         # Check cache
         cached_video = self.get_cached_video(cache_key)
@@ -973,7 +1724,7 @@ class GeminiVideoGenerator:
         Args:
             operation_name: Operation name/ID
             max_wait_seconds: Maximum time to wait in seconds
-            poll_interval_seconds: Interval between polls in seconds
+            poll_interval_seconds: Maximum interval between polls in seconds
             cache_key: Cache key for saving video
             
         Returns:
@@ -997,34 +1748,24 @@ class GeminiVideoGenerator:
             video_path = self.save_video(video_uri, operation_name.split('/')[-1])
         
         # Generate full video URL with domain (matches PHP implementation)
-        video_filename = Path(video_path).name
-        relative_path = self._get_relative_video_path(video_filename)
-        
-        # Use base URL if available, otherwise use relative path
-        if self.base_url:
-            # Ensure base_url doesn't have trailing slash
-            base_url_clean = self.base_url.rstrip('/')
-            video_url = f"{base_url_clean}/{relative_path}"
-        else:
-            # Use relative path if base URL not provided
-            video_url = f"/{relative_path}"
-        
-        # Generate embed URL
-        embed_url = f'<video controls width="100%" height="auto"><source src="{video_url}" type="video/mp4">Your browser does not support the video tag.</video>'
+        video_url = self._build_video_url(os.path.basename(video_path))
         
         return {
             'videoUrl': video_url,
             'videoPath': video_path,
-            'embedUrl': embed_url,
+            'embedUrl': self._EMBED_TEMPLATE.format(video_url=video_url),
             'status': 'completed'
         }
 
 
-def main():
-    """Main entry point for the console command"""
-    # Load .env file first (before parsing arguments)
-    load_env_file()
+@functools.lru_cache(maxsize=None)
+def _build_parser() -> argparse.ArgumentParser:
+    """
+    Build the command line parser (once per process)
     
+    Returns:
+        Argument parser for the console command
+    """
     parser = argparse.ArgumentParser(
         description='Generate video from image using Gemini Veo 3.1 API',
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -1089,6 +1830,13 @@ Command line arguments override environment variables.
         help='Wait for video generation to complete (synchronous mode)'
     )
     
+    parser.add_argument(
+        '--max-workers',
+        type=int,
+        default=MAX_PARALLEL_GENERATIONS,
+        help=f'Maximum number of images processed (loaded, submitted and polled) concurrently. Default: {MAX_PARALLEL_GENERATIONS}'
+    )
+    
     parser.add_argument(
         '--api-key',
         help='Google Gemini API key (overrides GEMINI_API_KEY environment variable)'
@@ -1114,63 +1862,178 @@ Command line arguments override environment variables.
         help='Path to .env file (defaults to .env in script directory or current directory)'
     )
     
+    parser.add_argument(
+        '--result-file',
+        help='Write the JSON result to this file instead of stdout'
+    )
+    
     parser.add_argument(
         '-v', '--verbose',
         action='store_true',
         help='Enable verbose debug output (shows image processing, prompt, and raw API request/response)'
     )
     
-    args = parser.parse_args()
+    return parser
+
+
+# Generators reused by run() calls in the same process (e.g. the API server), so the
+# per-generator URL validators and input key memo stay warm between requests
+GENERATOR_CACHE_SIZE = 16
+_GENERATORS: 'OrderedDict[tuple, GeminiVideoGenerator]' = OrderedDict()
+_GENERATORS_LOCK = threading.Lock()
+
+# Environment variables GeminiVideoGenerator reads when an argument is not given
+_GENERATOR_ENV_VARS = (
+    'MAGENTO_BASE_PATH', 'VIDEO_SAVE_PATH', 'MAGENTO_BASE_URL', 'BASE_URL',
+    'HTTP_HOST', 'SERVER_NAME', 'HTTPS', 'GOOGLE_API_DOMAIN'
+)
+
+
+def _get_generator(
+    api_key: str,
+    base_path: Optional[str],
+    base_url: Optional[str],
+    save_path: Optional[str],
+    verbose: bool,
+    quiet: bool = False
+) -> GeminiVideoGenerator:
+    """
+    Get a generator for the given settings, reusing one created by an earlier call
     
-    # Load .env file if specified
-    if args.env_file:
-        load_env_file(args.env_file)
+    Args:
+        api_key: Google Gemini API key
+        base_path: Base path for Magento installation
+        base_url: Base URL for generating full video URLs
+        save_path: Path where videos should be saved
+        verbose: Enable verbose debug output
+        quiet: Don't write console progress to stderr
+        
+    Returns:
+        GeminiVideoGenerator instance
+    """
+    # Include the environment (and cwd) the generator falls back to, so settings
+    # loaded later (e.g. from an env file) get a new generator
+    key = (
+        api_key, base_path, base_url, save_path, verbose, quiet, os.getcwd(),
+        tuple(os.getenv(name) for name in _GENERATOR_ENV_VARS)
+    )
+    with _GENERATORS_LOCK:
+        generator = _GENERATORS.get(key)
+        if generator is not None:
+            _GENERATORS.move_to_end(key)
+            return generator
     
+    generator = GeminiVideoGenerator(
+        api_key,
+        base_path=base_path,
+        base_url=base_url,
+        save_path=save_path,
+        verbose=verbose,
+        quiet=quiet
+    )
+    with _GENERATORS_LOCK:
+        generator = _GENERATORS.setdefault(key, generator)
+        _GENERATORS.move_to_end(key)
+        while len(_GENERATORS) > GENERATOR_CACHE_SIZE:
+            _GENERATORS.popitem(last=False)
+    return generator
+
+
+def run(
+    image_path: Union[str, list],
+    prompt: str,
+    second_image: Optional[str] = None,
+    aspect_ratio: str = '16:9',
+    silent_video: bool = False,
+    sync: bool = False,
+    auto_reference: bool = True,
+    api_key: Optional[str] = None,
+    base_path: Optional[str] = None,
+    save_path: Optional[str] = None,
+    base_url: Optional[str] = None,
+    verbose: bool = False,
+    max_workers: int = MAX_PARALLEL_GENERATIONS,
+    on_progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+    quiet: bool = False
+) -> Dict[str, Any]:
+    """
+    Generate videos for one or more images and build the command's JSON result
+    
+    This is what the console command runs after parsing its arguments; callers in
+    the same process (e.g. the API server) use it directly instead of spawning it.
+    
+    Args:
+        image_path: Image path or URL, or a list of them
+        prompt: Video generation prompt (applied to all images)
+        second_image: Optional second image path or URL
+        aspect_ratio: Aspect ratio (e.g., "16:9", "9:16", "1:1")
+        silent_video: Generate silent video
+        sync: Wait for video generation to complete
+        auto_reference: Automatically add image references to the prompt
+        api_key: Google Gemini API key (defaults to GEMINI_API_KEY)
+        base_path: Base path for Magento installation
+        save_path: Path where videos should be saved
+        base_url: Base URL for generating full video URLs
+        verbose: Enable verbose debug output
+        max_workers: Maximum number of images processed concurrently
+        on_progress: Optional callback receiving a progress event dict per image and
+            stage ('submitting', 'processing', 'completed', 'failed'); it may be
+            called from worker threads
+        quiet: Don't write console progress (spinner, redirect notes) to stderr, e.g.
+            when running inside a server
+        
+    Returns:
+        Result for a single image, or a summary with results and errors for multiple
+        images; 'success' is False if anything failed
+    """
     # Get API key: arg > env
-    api_key = args.api_key or os.getenv('GEMINI_API_KEY')
+    api_key = api_key or os.getenv('GEMINI_API_KEY')
     if not api_key:
-        result = {
+        return {
             'success': False,
             'error': 'API key is required. Use --api-key or set GEMINI_API_KEY environment variable.'
         }
-        print(json.dumps(result, indent=2))
-        sys.exit(1)
+    
+    image_paths = [image_path] if isinstance(image_path, str) else list(image_path)
     
     try:
-        # Initialize generator
+        # Initialize generator (reused across calls with the same settings)
         # Arguments override environment variables (handled in __init__)
-        generator = GeminiVideoGenerator(
-            api_key,
-            base_path=args.base_path,
-            base_url=args.base_url,
-            save_path=args.save_path,
-            verbose=args.verbose
-        )
+        generator = _get_generator(api_key, base_path, base_url, save_path, verbose, quiet)
         
         # Check if service is available
         if not generator.is_available():
-            result = {
+            return {
                 'success': False,
                 'error': 'Video service is not available. Please configure Gemini API key.'
             }
-            print(json.dumps(result, indent=2))
-            sys.exit(1)
         
-        # Process multiple image paths
-        image_paths = args.image_path
-        results = []
-        errors = []
+        progress = on_progress or _noop
         
-        for image_path in image_paths:
+        # Process multiple image paths concurrently (the work is network bound)
+        def process_one(image_path: str) -> tuple[bool, Dict[str, Any]]:
+            """Generate video for one image, returning (success, result item)"""
+            ok, result_item = generate_one(image_path)
+            if ok:
+                progress({'stage': result_item['status'], 'imagePath': image_path,
+                          'cached': result_item.get('cached', False)})
+            else:
+                progress({'stage': 'failed', 'imagePath': image_path, 'error': result_item['error']})
+            return ok, result_item
+        
+        def generate_one(image_path: str) -> tuple[bool, Dict[str, Any]]:
+            """Generate video for one image without progress reporting"""
             try:
+                progress({'stage': 'submitting', 'imagePath': image_path})
+                
                 # Generate video for this image (with optional second image)
                 operation = generator.generate_video_from_image(
                     image_path,
-                    args.prompt,
-                    args.aspect_ratio,
-                    args.silent_video,
-                    args.second_image,  # Pass second image if provided
-                    auto_reference_images=not args.no_auto_reference  # Enable auto-reference by default
+                    prompt,
+                    aspect_ratio,
+                    silent_video,
+                    second_image,  # Pass second image if provided
+                    auto_reference_images=auto_reference  # Enable auto-reference by default
                 )
                 
                 # Check if video was returned from cache
@@ -1183,17 +2046,14 @@ Command line arguments override environment variables.
                         'videoPath': operation['videoPath'],
                         'cached': True
                     }
-                    if args.second_image:
-                        result_item['secondImagePath'] = args.second_image
-                    results.append(result_item)
-                    continue
-                
                 # If sync option is set, wait for completion
-                if args.sync:
+                elif sync:
+                    progress({'stage': 'processing', 'imagePath': image_path,
+                              'operationName': operation['operationName']})
                     result_data = generator.poll_video_operation(
                         operation['operationName'],
                         300,  # 5 minutes max wait
-                        10,   # 10 seconds poll interval
+                        10,   # 10 seconds max poll interval
                         operation.get('cacheKey')
                     )
                     
@@ -1205,9 +2065,6 @@ Command line arguments override environment variables.
                         'videoPath': result_data['videoPath'],
                         'embedUrl': result_data.get('embedUrl')
                     }
-                    if args.second_image:
-                        result_item['secondImagePath'] = args.second_image
-                    results.append(result_item)
                 else:
                     # Return operation ID for async mode
                     result_item = {
@@ -1217,55 +2074,142 @@ Command line arguments override environment variables.
                         'operationName': operation['operationName'],
                         'message': 'Video generation started. Use --sync option to wait for completion.'
                     }
-                    if args.second_image:
-                        result_item['secondImagePath'] = args.second_image
-                    results.append(result_item)
+                if second_image:
+                    result_item['secondImagePath'] = second_image
+                return True, result_item
                     
             except FileNotFoundError as e:
-                errors.append({
+                return False, {
                     'imagePath': image_path,
                     'success': False,
                     'error': f'Source image not found: {str(e)}'
-                })
+                }
             except Exception as e:
-                errors.append({
+                return False, {
                     'imagePath': image_path,
                     'success': False,
                     'error': str(e)
-                })
+                }
+        
+        # map() keeps results in input order
+        results = []
+        errors = []
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(image_paths)))) as executor:
+            for ok, item in executor.map(process_one, image_paths):
+                (results if ok else errors).append(item)
         
         # Prepare final result
         if len(image_paths) == 1:
             # Single image - return single result format for backward compatibility
             if results:
-                result = results[0]
-            else:
-                result = errors[0]
-        else:
-            # Multiple images - return array format
-            result = {
-                'success': len(errors) == 0,
-                'total': len(image_paths),
-                'succeeded': len(results),
-                'failed': len(errors),
-                'results': results,
-                'errors': errors
-            }
+                return results[0]
+            return errors[0]
         
-        print(json.dumps(result, indent=2))
-        
-        # Exit with error code if any failures
-        if errors:
-            sys.exit(1)
-        sys.exit(0)
+        # Multiple images - return array format
+        return {
+            'success': len(errors) == 0,
+            'total': len(image_paths),
+            'succeeded': len(results),
+            'failed': len(errors),
+            'results': results,
+            'errors': errors
+        }
         
     except Exception as e:
-        result = {
+        return {
             'success': False,
             'error': str(e)
         }
-        print(json.dumps(result, indent=2))
-        sys.exit(1)
+
+
+def run_batch(
+    batch: list,
+    max_workers: int = MAX_PARALLEL_GENERATIONS,
+    timeout: Optional[float] = None,
+    executor: Optional[Executor] = None,
+    on_done: Optional[Callable[[int], None]] = None
+) -> Iterator[tuple[int, Dict[str, Any]]]:
+    """
+    Run several generation requests concurrently, yielding results as they finish
+    
+    Requests with the same settings share one generator (see _get_generator).
+    Every request is submitted before this returns.
+    
+    Args:
+        batch: List of keyword argument dicts for run()
+        max_workers: Maximum number of requests run concurrently (ignored with executor)
+        timeout: Seconds to wait for the whole batch; unfinished requests are
+            reported as failed
+        executor: Executor to run the requests on, e.g. one shared with other callers
+            to bound their combined concurrency (defaults to a new one for this batch)
+        on_done: Optional callback called with a request's index once it has finished
+            or been cancelled, which may be after a timeout and from a worker thread
+        
+    Returns:
+        Iterator of (index in batch, run() result) tuples in completion order
+    """
+    own_executor = executor is None
+    if own_executor:
+        executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(batch))))
+    futures = {executor.submit(run, **kwargs): index for index, kwargs in enumerate(batch)}
+    if on_done:
+        for future, index in futures.items():
+            future.add_done_callback(lambda _, index=index: on_done(index))
+    
+    def results() -> Iterator[tuple[int, Dict[str, Any]]]:
+        pending = set(futures)
+        try:
+            for future in as_completed(futures, timeout=timeout):
+                pending.discard(future)
+                yield futures[future], future.result()
+        except FutureTimeoutError:
+            for future in sorted(pending, key=futures.get):
+                future.cancel()
+                yield futures[future], {
+                    'success': False,
+                    'error': f'Video generation timed out after {timeout:g} seconds'
+                }
+        finally:
+            if own_executor:
+                executor.shutdown(wait=False, cancel_futures=True)
+            else:
+                # Don't leave queued requests nobody waits for on a shared executor
+                for future in pending:
+                    future.cancel()
+    
+    return results()
+
+
+def main():
+    """Main entry point for the console command"""
+    # Load .env file first (before parsing arguments)
+    load_env_file()
+    
+    args = _build_parser().parse_args()
+    
+    # Load .env file if specified
+    if args.env_file:
+        load_env_file(args.env_file)
+    
+    result = run(
+        args.image_path,
+        args.prompt,
+        second_image=args.second_image,
+        aspect_ratio=args.aspect_ratio,
+        silent_video=args.silent_video,
+        sync=args.sync,
+        auto_reference=not args.no_auto_reference,
+        api_key=args.api_key,
+        base_path=args.base_path,
+        save_path=args.save_path,
+        base_url=args.base_url,
+        verbose=args.verbose,
+        max_workers=args.max_workers
+    )
+    _print_json(result, args.result_file)
+    
+    # Exit with error code if any failures
+    sys.exit(0 if result.get('success') else 1)
 
 
 if __name__ == '__main__':
@@ -21,7 +21,8 @@ import sys
 
 # Add the current directory to path to import agento_video
 sys.path.insert(0, str(Path(__file__).parent))
-from agento_video import GeminiVideoGenerator
+import agento_video
+from agento_video import GeminiVideoGenerator, load_env_file
 
 
 @pytest.fixture(scope='session')
@@ -184,6 +185,143 @@ class TestGeminiVideoGenerator:
         cache_key3 = generator.generate_cache_key(test_image, "Different prompt", aspect_ratio)
         assert cache_key1 != cache_key3
     
+    def test_enhance_prompt_with_image_references(self, generator):
+        """Test context is only added when the prompt doesn't reference the images"""
+        enhance = generator._enhance_prompt_with_image_references
+        for prompt in ('Use Image 2 as background', 'blend FIRST IMAGE in', 'zoom into bg.jpg'):
+            assert enhance(prompt, 'fg.jpg', 'bg.jpg') == prompt
+        
+        enhanced = enhance('Make it move', 'fg.jpg', 'bg.jpg')
+        assert enhanced.startswith('Context:')
+        assert enhanced.endswith('Make it move')
+    
+    def test_url_image_downloaded_once(self, generator):
+        """Test URL images are fetched once and reused for hashing and submit"""
+        url = 'https://example.com/image.jpg'
+        agento_video._drop_cached_image(url)
+        with patch.object(generator, 'download_image_from_url', return_value=(b'image data', 'image/jpeg')) as mock_download:
+            image_data, mime_type, _ = generator._load_image(url)
+            generator.generate_cache_key(url, 'Test prompt', '16:9')
+        
+        assert mock_download.call_count == 1
+        assert image_data == b'image data'
+        assert mime_type == 'image/jpeg'
+    
+    def test_url_image_without_validator_expires(self, generator, monkeypatch):
+        """Test URL images that can't be revalidated are only reused for URL_IMAGE_TTL"""
+        url = 'https://example.com/no-validator.jpg'
+        agento_video._drop_cached_image(url)
+        now = [1000.0]
+        monkeypatch.setattr(agento_video.time, 'monotonic', lambda: now[0])
+        with patch.object(generator, 'download_image_from_url',
+                          side_effect=[(b'version1', 'image/jpeg'), (b'version2', 'image/jpeg')]) as mock_download:
+            assert generator._get_url_image(url)[0] == b'version1'
+            assert generator._get_url_image(url)[0] == b'version1'
+            now[0] += agento_video.URL_IMAGE_TTL + 1
+            assert generator._get_url_image(url)[0] == b'version2'
+        
+        assert mock_download.call_count == 2
+    
+    def test_url_validators_bounded(self, generator, monkeypatch):
+        """Test the per-URL validator memo keeps only the most recently used URLs"""
+        monkeypatch.setattr(agento_video, 'URL_MEMO_SIZE', 2)
+        head_response = MagicMock(ok=True, headers={'ETag': '"v1"'})
+        with patch.object(generator.video_service.session, 'head', return_value=head_response):
+            generator._probe_url('https://example.com/a.jpg')
+            generator._probe_url('https://example.com/b.jpg')
+            generator._probe_url('https://example.com/c.jpg')
+        
+        assert list(generator._url_validators) == ['https://example.com/b.jpg', 'https://example.com/c.jpg']
+    
+    def test_image_cache_bounded_by_bytes(self, monkeypatch):
+        """Test the image cache evicts old entries once their total size exceeds the limit"""
+        for key in ('img-a', 'img-b', 'img-c'):
+            agento_video._drop_cached_image(key)
+        monkeypatch.setattr(agento_video, 'IMAGE_CACHE_MAX_BYTES', 10)
+        agento_video._get_cached_image('img-a', 1, lambda: (b'12345', 'image/png'))
+        agento_video._get_cached_image('img-b', 1, lambda: (b'12345', 'image/png'))
+        agento_video._get_cached_image('img-c', 1, lambda: (b'12345', 'image/png'))
+        
+        assert 'img-a' not in agento_video._IMAGE_CACHE
+        assert 'img-a' not in agento_video._IMAGE_KEY_LOCKS
+        assert {'img-b', 'img-c'} <= set(agento_video._IMAGE_CACHE)
+        for key in ('img-b', 'img-c'):
+            agento_video._drop_cached_image(key)
+    
+    def test_image_key_lock_dropped_when_load_fails(self):
+        """Test failed loads don't leave their key lock behind"""
+        def fail():
+            raise RuntimeError('download failed')
+        
+        with pytest.raises(RuntimeError):
+            agento_video._get_cached_image('https://example.com/broken.jpg', None, fail)
+        assert 'https://example.com/broken.jpg' not in agento_video._IMAGE_KEY_LOCKS
+    
+    def test_download_image_from_url_too_large(self, generator, monkeypatch):
+        """Test oversized URL images are rejected while streaming"""
+        monkeypatch.setattr(agento_video, 'MAX_IMAGE_BYTES', 8)
+        response = MagicMock()
+        response.__enter__.return_value = response
+        response.headers = {'Content-Type': 'image/png'}
+        response.iter_content.return_value = iter([b'12345', b'67890'])
+        
+        with patch.object(agento_video.get_session(), 'get', return_value=response):
+            with pytest.raises(RuntimeError, match='too large'):
+                generator.download_image_from_url('https://example.com/huge.png')
+    
+    def test_download_image_from_url_returns_bytes(self, generator):
+        """Test downloaded images are immutable bytes (they are shared through the cache)"""
+        response = MagicMock()
+        response.__enter__.return_value = response
+        response.headers = {'Content-Type': 'image/png', 'Content-Length': '10'}
+        response.iter_content.return_value = iter([b'12345', b'67890'])
+        
+        with patch.object(agento_video.get_session(), 'get', return_value=response):
+            image_data, mime_type = generator.download_image_from_url('https://example.com/a.png')
+        
+        assert type(image_data) is bytes
+        assert (image_data, mime_type) == (b'1234567890', 'image/png')
+    
+    def test_submit_request_body(self, temp_dir, api_key):
+        """Test the spliced request body is valid JSON carrying both encoded images"""
+        session = MagicMock()
+        session.post.return_value.json.return_value = {'name': 'operations/test'}
+        generator = GeminiVideoGenerator(api_key, str(temp_dir), base_url='http://localhost', session=session)
+        
+        generator.video_service.submit_video_generation_request(
+            'Prompt with "quotes"', b'\x00first\xff', 'image/png', '9:16', b'second', 'image/jpeg'
+        )
+        
+        body = json.loads(session.post.call_args.kwargs['data'])
+        instance = body['instances'][0]
+        assert instance['prompt'] == 'Prompt with "quotes"'
+        assert base64.b64decode(instance['image']['bytesBase64Encoded']) == b'\x00first\xff'
+        assert instance['image']['mimeType'] == 'image/png'
+        assert base64.b64decode(instance['image2']['bytesBase64Encoded']) == b'second'
+        assert body['parameters'] == {'aspectRatio': '9:16'}
+    
+    def test_injected_session_used_for_downloads(self, temp_dir, api_key):
+        """Test a session passed to the generator is used instead of the shared one"""
+        session = MagicMock()
+        response = session.get.return_value
+        response.__enter__.return_value = response
+        response.headers = {'Content-Type': 'image/png'}
+        response.iter_content.return_value = iter([b'png data'])
+        generator = GeminiVideoGenerator(api_key, str(temp_dir), base_url='http://localhost', session=session)
+        
+        assert generator.download_image_from_url('https://example.com/a.png') == (b'png data', 'image/png')
+        session.get.assert_called_once()
+        assert generator.video_service.session is session
+    
+    def test_local_image_cache_invalidated_on_change(self, generator, temp_dir):
+        """Test cached local image data is reloaded once the file changes"""
+        image_path = temp_dir / 'changing.png'
+        image_path.write_bytes(b'first')
+        assert generator._load_image(str(image_path))[:2] == (b'first', 'image/png')
+        
+        image_path.write_bytes(b'second version')
+        assert generator._load_image(str(image_path))[0] == b'second version'
+    
     def test_get_cached_video_exists(self, generator, temp_dir):
         """Test retrieving cached video"""
         cache_key = 'test_cache_key_123'
@@ -248,6 +386,60 @@ class TestGeminiVideoGenerator:
         assert Path(video_path).exists()
         assert Path(video_path).stat().st_size > 0
     
+    def test_save_video_empty_download(self, generator):
+        """Test empty downloads raise and leave no partial files behind"""
+        empty_response = MagicMock()
+        empty_response.__enter__.return_value = empty_response
+        empty_response.history = []
+        empty_response.iter_content.return_value = iter([])
+        
+        with patch.object(agento_video.get_session(), 'get', return_value=empty_response):
+            with pytest.raises(RuntimeError):
+                generator.save_video('http://127.0.0.1/videos/empty', 'empty_key')
+        
+        assert list(generator.video_dir.iterdir()) == []
+    
+    def test_download_video_file_uri(self, generator, temp_dir):
+        """Test file:// video URIs are copied without an HTTP request"""
+        source = temp_dir / 'staged video.mp4'
+        source.write_bytes(b'local video' * 1000)
+        
+        with patch.object(agento_video.get_session(), 'get') as mock_get:
+            size = generator.video_service.download_video(source.as_uri(), temp_dir / 'copy.mp4')
+        
+        mock_get.assert_not_called()
+        assert size == source.stat().st_size
+        assert (temp_dir / 'copy.mp4').read_bytes() == source.read_bytes()
+    
+    def test_save_video_recreates_removed_directory(self, generator, temp_dir):
+        """Test a video directory removed after start-up is recreated when saving"""
+        source = temp_dir / 'source.mp4'
+        source.write_bytes(b'video data')
+        shutil.rmtree(generator.video_dir)
+        
+        video_path = generator.save_video(source.as_uri(), 'recreated')
+        
+        assert Path(video_path).read_bytes() == b'video data'
+    
+    def test_download_video_api_key_param(self, generator, temp_dir):
+        """Test the API key is only appended to Gemini URIs that lack a key parameter"""
+        response = MagicMock()
+        response.__enter__.return_value = response
+        response.history = []
+        response.iter_content.side_effect = lambda *args, **kwargs: iter([b'video'])
+        service = generator.video_service
+        
+        with patch.object(agento_video.get_session(), 'get', return_value=response) as mock_get:
+            base = 'https://generativelanguage.googleapis.com/v1beta/files/abc:download'
+            service.download_video(f'{base}?alt=media&monkey=1', temp_dir / 'a.mp4')
+            service.download_video(f'{base}?key=existing', temp_dir / 'b.mp4')
+            service.download_video('https://example.com/monkey=1/video.mp4', temp_dir / 'c.mp4')
+        
+        urls = [call.args[0] for call in mock_get.call_args_list]
+        assert urls[0] == f'{base}?alt=media&monkey=1&key={service.api_key}'
+        assert urls[1] == f'{base}?key=existing'
+        assert urls[2] == 'https://example.com/monkey=1/video.mp4'
+    
     def test_generate_video_from_image_success(self, generator, test_image, mock_server):
         """Test successful video generation using mock server"""
         # Use real requests to mock server (no mocking needed)
@@ -284,6 +476,76 @@ class TestGeminiVideoGenerator:
         assert 'videoUrl' in result
         assert result['videoPath'] == str(video_path)
     
+    def test_same_image_in_both_slots_loaded_once(self, generator, test_image):
+        """Test passing the same image twice loads it once and submits it in both slots"""
+        with patch.object(generator, '_load_image', wraps=generator._load_image) as mock_load, \
+                patch.object(generator.video_service, 'submit_video_generation_request',
+                             return_value={'operationName': 'operations/same'}) as mock_submit:
+            generator.generate_video_from_image(test_image, 'Test prompt', '16:9', False, test_image)
+        
+        assert mock_load.call_count == 1
+        kwargs = mock_submit.call_args.kwargs
+        assert kwargs['second_image_data'] == kwargs['image_data']
+    
+    def test_generate_video_from_image_cached_skips_image_load(self, generator, test_image):
+        """Test that a repeated cache hit is served without reading the image again"""
+        cache_key = generator.generate_cache_key(test_image, 'Test prompt', '16:9')
+        generator.video_dir.mkdir(parents=True, exist_ok=True)
+        (generator.video_dir / f'veo_{cache_key}.mp4').write_bytes(b'cached video')
+        
+        generator.generate_video_from_image(test_image, 'Test prompt', '16:9', False)
+        
+        with patch.object(generator, '_load_image') as mock_load, \
+                patch.object(generator, '_enhance_prompt_with_image_references') as mock_enhance:
+            result = generator.generate_video_from_image(test_image, 'Test prompt', '16:9', False)
+        
+        mock_load.assert_not_called()
+        mock_enhance.assert_not_called()
+        assert result['fromCache'] is True
+        
+        # Prompt options are part of the key
+        with patch.object(generator.video_service, 'submit_video_generation_request',
+                          return_value={'operationName': 'operations/silent'}):
+            result = generator.generate_video_from_image(test_image, 'Test prompt', '16:9', True)
+        assert result['operationName'] == 'operations/silent'
+    
+    def test_generate_video_from_url_cached_skips_hashing(self, generator):
+        """Test a repeated URL cache hit skips prompt processing and cache key generation"""
+        url = 'https://example.com/cached.jpg'
+        agento_video._drop_cached_image(url)
+        with patch.object(generator, '_probe_url', return_value=None), \
+                patch.object(generator, 'download_image_from_url', return_value=(b'image', 'image/jpeg')):
+            cache_key = generator.generate_cache_key(url, 'Test prompt', '16:9')
+            (generator.video_dir / f'veo_{cache_key}.mp4').write_bytes(b'cached video')
+            generator.generate_video_from_image(url, 'Test prompt', '16:9', False)
+            
+            with patch.object(generator, 'generate_cache_key') as mock_key:
+                result = generator.generate_video_from_image(url, 'Test prompt', '16:9', False)
+        
+        mock_key.assert_not_called()
+        assert result['fromCache'] is True
+    
+    def test_generate_video_from_url_validator_skips_download(self, generator, temp_dir, api_key):
+        """Test a URL with unchanged ETag is served from cache by a new generator without downloading"""
+        url = 'https://example.com/etag.jpg'
+        agento_video._drop_cached_image(url)
+        head_response = MagicMock(ok=True, headers={'ETag': '"v1"', 'Content-Length': '5'})
+        session = agento_video.get_session()
+        
+        with patch.object(session, 'head', return_value=head_response), \
+                patch.object(GeminiVideoGenerator, 'download_image_from_url', return_value=(b'image', 'image/jpeg')) as mock_download:
+            cache_key = generator.generate_cache_key(url, 'Test prompt', '16:9')
+            (generator.video_dir / f'veo_{cache_key}.mp4').write_bytes(b'cached video')
+            generator.generate_video_from_image(url, 'Test prompt', '16:9', False)
+            agento_video._drop_cached_image(url)
+            mock_download.reset_mock()
+            
+            fresh = GeminiVideoGenerator(api_key, str(temp_dir), base_url=generator.base_url)
+            result = fresh.generate_video_from_image(url, 'Test prompt', '16:9', False)
+        
+        mock_download.assert_not_called()
+        assert result['fromCache'] is True
+    
     def test_poll_video_operation_success(self, generator, test_image, mock_server):
         """Test successful video operation polling using mock server"""
         # First generate a video operation
@@ -311,7 +573,7 @@ class TestGeminiVideoGenerator:
         assert 'embedUrl' in result
         assert Path(result['videoPath']).exists()
     
-    @patch('agento_video.requests.get')
+    @patch.object(agento_video.get_session(), 'get')
     def test_poll_video_operation_safety_filter(self, mock_get, generator):
         """Test polling detects safety filter blocks"""
         operation_name = 'operations/test-operation-123'
@@ -342,7 +604,7 @@ class TestGeminiVideoGenerator:
         assert 'Safety Filter' in str(exc_info.value) or 'safety filters' in str(exc_info.value)
         assert 'SAFETY' in str(exc_info.value) or 'COPYRIGHT' in str(exc_info.value)
     
-    @patch('agento_video.requests.get')
+    @patch.object(agento_video.get_session(), 'get')
     def test_poll_video_operation_timeout(self, mock_get, generator):
         """Test polling timeout"""
         operation_name = 'operations/test-operation-123'
@@ -379,6 +641,119 @@ class TestGeminiVideoGenerator:
         assert expected_video_dir.is_dir()
 
 
+class TestLoadEnvFile:
+    """Test suite for the manual .env parser (used when python-dotenv is missing)"""
+    
+    def test_manual_env_parsing(self, temp_dir, monkeypatch):
+        """Test quoting, comments and precedence of existing environment variables"""
+        monkeypatch.setattr(agento_video, '_dotenv_available', False)
+        for key in ('ENV_TEST_BARE', 'ENV_TEST_DOUBLE', 'ENV_TEST_SINGLE', 'ENV_TEST_HASH', 'ENV_TEST_EXISTING'):
+            monkeypatch.delenv(key, raising=False)
+        monkeypatch.setenv('ENV_TEST_EXISTING', 'from-env')
+        
+        env_file = temp_dir / '.env'
+        env_file.write_text(
+            '# comment line\n'
+            'ENV_TEST_BARE=bare value   # trailing comment\n'
+            'ENV_TEST_DOUBLE = "a = b"\n'
+            "ENV_TEST_SINGLE='single'\r\n"
+            'ENV_TEST_HASH=abc#123\n'
+            'ENV_TEST_EXISTING=from-file\n'
+        )
+        
+        load_env_file(str(env_file))
+        
+        assert os.environ['ENV_TEST_BARE'] == 'bare value'
+        assert os.environ['ENV_TEST_DOUBLE'] == 'a = b'
+        assert os.environ['ENV_TEST_SINGLE'] == 'single'
+        assert os.environ['ENV_TEST_HASH'] == 'abc#123'
+        assert os.environ['ENV_TEST_EXISTING'] == 'from-env'
+    
+    def test_read_env_file_leaves_environment(self, temp_dir, monkeypatch):
+        """Test read_env_file returns the file's variables without setting them"""
+        monkeypatch.delenv('ENV_TEST_READ', raising=False)
+        env_file = temp_dir / '.env'
+        env_file.write_text('ENV_TEST_READ="value"\n')
+        
+        assert agento_video.read_env_file(str(env_file)) == {'ENV_TEST_READ': 'value'}
+        assert 'ENV_TEST_READ' not in os.environ
+        assert agento_video.read_env_file(str(temp_dir / 'missing.env')) == {}
+
+
+class TestMain:
+    """Test suite for the command line entry point"""
+    
+    def test_multiple_images_keep_input_order(self, temp_dir, api_key, monkeypatch, capsys):
+        """Test images processed concurrently are reported in input order"""
+        def fake_generate(self, image_path, *args, **kwargs):
+            if image_path == 'missing.jpg':
+                raise FileNotFoundError(image_path)
+            # Finish the first image last
+            time.sleep(0.2 if image_path == 'a.jpg' else 0)
+            return {'fromCache': True, 'videoUrl': f'/{image_path}.mp4', 'videoPath': f'{image_path}.mp4'}
+        
+        monkeypatch.setattr(GeminiVideoGenerator, 'generate_video_from_image', fake_generate)
+        monkeypatch.setattr(sys, 'argv', [
+            'agento_video.py', '-ip', 'a.jpg', 'missing.jpg', 'b.jpg', 'c.jpg',
+            '-p', 'Test prompt', '--api-key', api_key, '--base-path', str(temp_dir)
+        ])
+        
+        with pytest.raises(SystemExit) as exc_info:
+            agento_video.main()
+        
+        output = json.loads(capsys.readouterr().out)
+        assert exc_info.value.code == 1
+        assert [item['imagePath'] for item in output['results']] == ['a.jpg', 'b.jpg', 'c.jpg']
+        assert output['errors'][0]['imagePath'] == 'missing.jpg'
+        assert output['succeeded'] == 3 and output['failed'] == 1
+    
+    def test_run_returns_result_without_exiting(self, temp_dir, monkeypatch):
+        """Test run() reports errors in its result instead of printing or exiting"""
+        monkeypatch.delenv('GEMINI_API_KEY', raising=False)
+        result = agento_video.run('a.jpg', 'Test prompt', base_path=str(temp_dir))
+        assert result['success'] is False
+        assert 'API key is required' in result['error']
+        
+        result = agento_video.run(str(temp_dir / 'missing.jpg'), 'Test prompt', api_key='key', base_path=str(temp_dir))
+        assert result['success'] is False
+        assert 'not found' in result['error']
+    
+    def test_run_reuses_generator(self, temp_dir, api_key, monkeypatch):
+        """Test run() reuses the generator for the same settings and environment"""
+        generators = []
+        def fake_generate(self, image_path, *args, **kwargs):
+            generators.append(self)
+            return {'fromCache': True, 'videoUrl': '/v.mp4', 'videoPath': 'v.mp4'}
+        
+        monkeypatch.setattr(GeminiVideoGenerator, 'generate_video_from_image', fake_generate)
+        for _ in range(2):
+            agento_video.run('a.jpg', 'Test prompt', api_key=api_key, base_path=str(temp_dir))
+        monkeypatch.setenv('VIDEO_SAVE_PATH', 'media/other')
+        agento_video.run('a.jpg', 'Test prompt', api_key=api_key, base_path=str(temp_dir))
+        
+        assert generators[0] is generators[1]
+        assert generators[2] is not generators[0]
+        assert generators[2].video_dir == temp_dir / 'media' / 'other'
+    
+    def test_run_reports_progress(self, temp_dir, api_key, monkeypatch):
+        """Test run() reports each image's stages to the progress callback"""
+        def fake_generate(self, image_path, *args, **kwargs):
+            if image_path == 'missing.jpg':
+                raise FileNotFoundError(image_path)
+            return {'fromCache': True, 'videoUrl': f'/{image_path}.mp4', 'videoPath': f'{image_path}.mp4'}
+        
+        monkeypatch.setattr(GeminiVideoGenerator, 'generate_video_from_image', fake_generate)
+        events = []
+        agento_video.run(['a.jpg', 'missing.jpg'], 'Test prompt', api_key=api_key,
+                         base_path=str(temp_dir), max_workers=1, on_progress=events.append)
+        
+        assert [(e['imagePath'], e['stage']) for e in events] == [
+            ('a.jpg', 'submitting'), ('a.jpg', 'completed'),
+            ('missing.jpg', 'submitting'), ('missing.jpg', 'failed')
+        ]
+        assert events[1]['cached'] is True
+
+
 class TestIntegration:
     """Integration tests that verify end-to-end functionality using mock server"""
     
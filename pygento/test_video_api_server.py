@@ -0,0 +1,574 @@
+#!/usr/bin/env python3
+"""
+Pytest tests for video_api_server.py
+Runs the handler on an ephemeral port with agento_video.run patched out.
+"""
+
+import pytest
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.client import HTTPConnection
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+from unittest.mock import patch
+
+import requests
+
+# Add the current directory to path to import video_api_server
+sys.path.insert(0, str(Path(__file__).parent))
+import video_api_server
+
+
+API_KEY = 'test-server-key'
+
+
+@pytest.fixture
+def server_url():
+    """Start the API server in a background thread"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), video_api_server.create_handler(API_KEY, None))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def isolated_server_url(tmp_path):
+    """Start the API server in isolated mode with a stand-in CLI script"""
+    script = tmp_path / 'fake_agento_video.py'
+    script.write_text(
+        "import json, sys\n"
+        "args = sys.argv[1:]\n"
+        "image_path = args[args.index('-ip') + 1]\n"
+        "if image_path == 'slow.jpg':\n"
+        "    import os, time\n"
+        "    with open(os.path.join(os.path.dirname(sys.argv[0]), 'pid'), 'w') as f:\n"
+        "        f.write(str(os.getpid()))\n"
+        "    time.sleep(30)\n"
+        "if image_path == 'missing.jpg':\n"
+        "    sys.stderr.write('Source image not found')\n"
+        "    sys.exit(1)\n"
+        "result = {'success': True, 'imagePath': image_path}\n"
+        "with open(args[args.index('--result-file') + 1], 'w') as f:\n"
+        "    json.dump(result, f)\n"
+    )
+    server = ThreadingHTTPServer(('127.0.0.1', 0), video_api_server.create_handler(API_KEY, script))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def wait_for_pid(pid_file):
+    """Wait for the stand-in CLI script to record its pid"""
+    for _ in range(100):
+        if pid_file.exists() and pid_file.read_text():
+            return int(pid_file.read_text())
+        time.sleep(0.05)
+    raise AssertionError("script did not start")
+
+
+def process_exited(pid):
+    """Wait up to 5 seconds for a process to exit"""
+    for _ in range(100):
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return True
+        time.sleep(0.05)
+    return False
+
+
+@pytest.fixture(autouse=True)
+def clear_response_cache():
+    """Start every test with an empty response cache"""
+    video_api_server._response_cache.clear()
+    yield
+    video_api_server._response_cache.clear()
+
+
+def post(url, data, api_key=API_KEY, path='/'):
+    """POST JSON to the server with the API key"""
+    return requests.post(f"{url}{path}", json=data, headers={'X-API-Key': api_key}, timeout=10)
+
+
+class TestVideoAPIServer:
+    """Test cases for the video API server"""
+    
+    def test_unauthorized(self, server_url):
+        """Test requests with a wrong API key are rejected"""
+        response = post(server_url, {'image_path': 'a.jpg', 'prompt': 'p'}, api_key='wrong')
+        assert response.status_code == 401
+        assert response.json() == {'success': False, 'error': 'Unauthorized: Invalid API key'}
+    
+    def test_missing_prompt(self, server_url):
+        """Test requests without a prompt are rejected"""
+        response = post(server_url, {'image_path': 'a.jpg'})
+        assert response.status_code == 400
+        assert response.json()['error'] == "Bad Request: 'prompt' is required"
+    
+    def test_invalid_field_types(self, server_url):
+        """Test fields of the wrong type are rejected with a message naming the field"""
+        with patch.object(video_api_server.agento_video, 'run') as run:
+            response = post(server_url, {'image_path': 'a.jpg', 'prompt': 'spin', 'sync': 'yes'})
+            assert response.status_code == 400
+            assert response.json()['error'] == "Bad Request: 'sync' must be a boolean"
+            
+            response = post(server_url, {'image_path': ['a.jpg', 3], 'prompt': 'spin'})
+            assert response.status_code == 400
+        run.assert_not_called()
+    
+    def test_invalid_json(self, server_url):
+        """Test malformed JSON bodies are rejected"""
+        response = requests.post(server_url, data=b'{"image_path": ', headers={'X-API-Key': API_KEY}, timeout=10)
+        assert response.status_code == 400
+    
+    def test_generate_runs_in_process(self, server_url, monkeypatch):
+        """Test request fields are passed to agento_video.run directly"""
+        monkeypatch.setenv('GEMINI_API_KEY', 'gemini-key')
+        result = {'success': True, 'status': 'completed', 'videoUrl': '/v.mp4'}
+        with patch.object(video_api_server.agento_video, 'run', return_value=result) as run:
+            response = post(server_url, {
+                'image_path': ['a.jpg', 'b.jpg'],
+                'prompt': 'spin',
+                'aspect_ratio': '9:16',
+                'no_auto_reference': True
+            })
+        
+        assert response.status_code == 200
+        assert response.json() == {'success': True, 'data': result}
+        kwargs = run.call_args.kwargs
+        assert kwargs['image_path'] == ['a.jpg', 'b.jpg']
+        assert kwargs['prompt'] == 'spin'
+        assert kwargs['aspect_ratio'] == '9:16'
+        assert kwargs['sync'] is True
+        assert kwargs['auto_reference'] is False
+        assert kwargs['api_key'] == 'gemini-key'
+        assert kwargs['quiet'] is True
+    
+    def test_env_file_applies_to_request_only(self, server_url, tmp_path, monkeypatch):
+        """Test an env_file supplies settings for its request without changing the server environment"""
+        monkeypatch.delenv('GEMINI_API_KEY', raising=False)
+        monkeypatch.delenv('VIDEO_SAVE_PATH', raising=False)
+        env_file = tmp_path / 'request.env'
+        env_file.write_text('GEMINI_API_KEY=file-key\nVIDEO_SAVE_PATH=videos\n')
+        result = {'success': True, 'status': 'completed', 'videoUrl': '/v.mp4'}
+        with patch.object(video_api_server.agento_video, 'run', return_value=result) as run:
+            post(server_url, {'image_path': 'a.jpg', 'prompt': 'spin', 'env_file': str(env_file)})
+            post(server_url, {'image_path': 'a.jpg', 'prompt': 'spin', 'cache': False})
+        
+        first, second = (call.kwargs for call in run.call_args_list)
+        assert (first['api_key'], first['save_path']) == ('file-key', 'videos')
+        assert (second['api_key'], second['save_path']) == (None, None)
+        assert 'GEMINI_API_KEY' not in os.environ
+    
+    def test_env_base_url_normalized(self, tmp_path, monkeypatch):
+        """Test base URLs from the environment get the generator's store code normalization"""
+        monkeypatch.delenv('BASE_URL', raising=False)
+        monkeypatch.setenv('MAGENTO_BASE_URL', 'https://shop.test/default/pub/')
+        request = {'image_path': 'a.jpg', 'prompt': 'spin'}
+        # Left to the generator, which normalizes it the same way as the CLI
+        assert video_api_server._run_kwargs(request)['base_url'] is None
+        
+        monkeypatch.delenv('MAGENTO_BASE_URL')
+        env_file = tmp_path / 'request.env'
+        env_file.write_text('MAGENTO_BASE_URL=https://shop.test/default/pub/\n')
+        assert video_api_server._run_kwargs({**request, 'env_file': str(env_file)})['base_url'] == 'https://shop.test/pub'
+        assert video_api_server._run_kwargs({**request, 'base_url': 'https://cdn.test'})['base_url'] == 'https://cdn.test'
+    
+    def test_generate_failure(self, server_url):
+        """Test a failed generation is reported with its error"""
+        result = {'success': False, 'error': 'Source image not found: a.jpg'}
+        with patch.object(video_api_server.agento_video, 'run', return_value=result):
+            response = post(server_url, {'image_path': 'a.jpg', 'prompt': 'spin'})
+        
+        body = response.json()
+        assert body['success'] is False
+        assert body['error'] == 'Source image not found: a.jpg'
+    
+    def test_busy_when_all_slots_taken(self, server_url, monkeypatch):
+        """Test requests are rejected with 503 when no generation slot is free"""
+        monkeypatch.setattr(video_api_server, '_generation_slots', threading.BoundedSemaphore(1))
+        video_api_server._generation_slots.acquire()
+        with patch.object(video_api_server.agento_video, 'run') as run:
+            response = post(server_url, {'image_path': 'a.jpg', 'prompt': 'spin'})
+        
+        assert response.status_code == 503
+        run.assert_not_called()
+    
+    def test_timed_out_generation_keeps_slot(self, server_url, monkeypatch):
+        """Test a generation still running after the request timed out keeps its slot"""
+        monkeypatch.setattr(video_api_server, '_generation_slots', threading.BoundedSemaphore(1))
+        monkeypatch.setattr(video_api_server, 'GENERATION_TIMEOUT', 0.2)
+        finish = threading.Event()
+        
+        def slow_run(*args, **kwargs):
+            finish.wait(10)
+            return {'success': True, 'videoUrl': '/v.mp4'}
+        
+        with patch.object(video_api_server.agento_video, 'run', side_effect=slow_run):
+            try:
+                response = post(server_url, {'image_path': 'a.jpg', 'prompt': 'spin'})
+                assert response.json()['error'] == 'Video generation timed out after 0.2 seconds'
+                
+                assert post(server_url, {'image_path': 'b.jpg', 'prompt': 'spin'}).status_code == 503
+            finally:
+                finish.set()
+            deadline = time.monotonic() + 10
+            while not video_api_server._generation_slots.acquire(blocking=False):
+                assert time.monotonic() < deadline
+                time.sleep(0.05)
+            video_api_server._generation_slots.release()
+    
+    def test_identical_request_served_from_cache(self, server_url, tmp_path):
+        """Test a repeated request reuses the response until the image changes"""
+        image = tmp_path / 'a.jpg'
+        image.write_bytes(b'image-1')
+        video = tmp_path / 'v.mp4'
+        video.write_bytes(b'video')
+        result = {'success': True, 'status': 'completed', 'videoPath': str(video)}
+        request = {'image_path': str(image), 'prompt': 'spin'}
+        
+        with patch.object(video_api_server.agento_video, 'run', return_value=result) as run:
+            first = post(server_url, request).json()
+            second = post(server_url, request).json()
+            assert run.call_count == 1
+            assert first == second
+            
+            # Fields that don't affect the result don't change the key
+            post(server_url, {**request, 'job_id': 'job-1'})
+            assert run.call_count == 1
+            
+            post(server_url, {**request, 'cache': False})
+            assert run.call_count == 2
+            
+            image.write_bytes(b'image-2-changed')
+            post(server_url, request)
+            assert run.call_count == 3
+    
+    def test_response_cache_uses_env_file_base_path(self, server_url, tmp_path, monkeypatch):
+        """Test the cache key fingerprints the image under the env file's MAGENTO_BASE_PATH"""
+        monkeypatch.delenv('MAGENTO_BASE_PATH', raising=False)
+        image = tmp_path / 'pub' / 'media' / 'a.jpg'
+        image.parent.mkdir(parents=True)
+        image.write_bytes(b'image-1')
+        video = tmp_path / 'v.mp4'
+        video.write_bytes(b'video')
+        env_file = tmp_path / 'request.env'
+        env_file.write_text(f'MAGENTO_BASE_PATH={tmp_path}\n')
+        result = {'success': True, 'status': 'completed', 'videoPath': str(video)}
+        request = {'image_path': 'a.jpg', 'prompt': 'spin', 'env_file': str(env_file)}
+        
+        with patch.object(video_api_server.agento_video, 'run', return_value=result) as run:
+            post(server_url, request)
+            post(server_url, request)
+            assert run.call_count == 1
+            
+            image.write_bytes(b'image-2-changed')
+            post(server_url, request)
+            assert run.call_count == 2
+    
+    def test_stream_reports_progress_and_result(self, server_url):
+        """Test /stream sends progress events followed by the result"""
+        result = {'success': True, 'status': 'completed', 'videoUrl': '/v.mp4'}
+        
+        def fake_run(*args, on_progress=None, **kwargs):
+            on_progress({'stage': 'submitting', 'imagePath': 'a.jpg'})
+            return result
+        
+        with patch.object(video_api_server.agento_video, 'run', side_effect=fake_run):
+            response = post(server_url, {'image_path': 'a.jpg', 'prompt': 'spin'}, path='/stream')
+        
+        assert response.headers['Content-Type'] == 'text/event-stream'
+        messages = [m.split('\n') for m in response.text.strip().split('\n\n')]
+        assert [m[0] for m in messages] == ['event: progress', 'event: result']
+        assert json.loads(messages[0][1][len('data: '):])['stage'] == 'submitting'
+        assert json.loads(messages[1][1][len('data: '):]) == {'success': True, 'data': result}
+    
+    def test_stream_holds_slot_after_client_disconnects(self, server_url, monkeypatch):
+        """Test a disconnected /stream client does not free the slot of a running generation"""
+        monkeypatch.setattr(video_api_server, '_generation_slots', threading.BoundedSemaphore(1))
+        started = threading.Event()
+        finish = threading.Event()
+        
+        def slow_run(*args, on_progress=None, **kwargs):
+            started.set()
+            # Keep writing progress so the handler notices the disconnect
+            while not finish.wait(0.05):
+                on_progress({'stage': 'processing', 'imagePath': 'a.jpg'})
+            return {'success': True, 'status': 'completed', 'videoUrl': '/v.mp4'}
+        
+        with patch.object(video_api_server.agento_video, 'run', side_effect=slow_run):
+            try:
+                response = requests.post(
+                    server_url + '/stream', json={'image_path': 'a.jpg', 'prompt': 'spin'},
+                    headers={'X-API-Key': API_KEY}, stream=True, timeout=10
+                )
+                assert started.wait(10)
+                response.close()
+                time.sleep(0.5)
+                
+                assert post(server_url, {'image_path': 'b.jpg', 'prompt': 'spin'}).status_code == 503
+            finally:
+                finish.set()
+            deadline = time.monotonic() + 10
+            while not video_api_server._generation_slots.acquire(blocking=False):
+                assert time.monotonic() < deadline
+                time.sleep(0.05)
+            video_api_server._generation_slots.release()
+    
+    def test_batch_streams_results_per_item(self, server_url):
+        """Test /batch runs every item and reports one JSON line per item"""
+        def fake_run(image_path, prompt, **kwargs):
+            if image_path == 'missing.jpg':
+                return {'success': False, 'error': 'Source image not found'}
+            return {'success': True, 'videoUrl': f'/{image_path}.mp4'}
+        
+        with patch.object(video_api_server.agento_video, 'run', side_effect=fake_run):
+            response = post(server_url, {'requests': [
+                {'image_path': 'a.jpg', 'prompt': 'spin'},
+                {'image_path': 'missing.jpg', 'prompt': 'spin'}
+            ]}, path='/batch')
+        
+        lines = sorted((json.loads(line) for line in response.text.splitlines()), key=lambda l: l['index'])
+        assert lines[0] == {'index': 0, 'success': True, 'data': {'success': True, 'videoUrl': '/a.jpg.mp4'}}
+        assert lines[1]['success'] is False
+        assert lines[1]['error'] == 'Source image not found'
+    
+    def test_batch_size_limited(self, server_url):
+        """Test /batch rejects more than MAX_BATCH_SIZE requests"""
+        items = [{'image_path': 'a.jpg', 'prompt': 'spin'}] * (video_api_server.MAX_BATCH_SIZE + 1)
+        with patch.object(video_api_server.agento_video, 'run') as run:
+            response = post(server_url, {'requests': items}, path='/batch')
+        
+        assert response.status_code == 400
+        run.assert_not_called()
+    
+    def test_batch_holds_slot_until_items_finish(self, server_url, monkeypatch):
+        """Test a timed-out batch keeps its slot while its items are still running"""
+        monkeypatch.setattr(video_api_server, '_generation_slots', threading.BoundedSemaphore(1))
+        monkeypatch.setattr(video_api_server, 'GENERATION_TIMEOUT', 0.2)
+        finish = threading.Event()
+        
+        def slow_run(*args, **kwargs):
+            finish.wait(10)
+            return {'success': True, 'videoUrl': '/v.mp4'}
+        
+        with patch.object(video_api_server.agento_video, 'run', side_effect=slow_run):
+            try:
+                response = post(server_url, {'requests': [{'image_path': 'a.jpg', 'prompt': 'spin'}]}, path='/batch')
+                assert json.loads(response.text)['error'].startswith('Video generation timed out')
+                
+                assert post(server_url, {'image_path': 'b.jpg', 'prompt': 'spin'}).status_code == 503
+            finally:
+                finish.set()
+            deadline = time.monotonic() + 10
+            while not video_api_server._generation_slots.acquire(blocking=False):
+                assert time.monotonic() < deadline
+                time.sleep(0.05)
+            video_api_server._generation_slots.release()
+    
+    def test_batch_items_take_one_slot_each(self, server_url, monkeypatch):
+        """Test batch items run in slots of their own and items beyond the free slots are rejected"""
+        monkeypatch.setattr(video_api_server, '_generation_slots', threading.BoundedSemaphore(2))
+        started = []
+        finish = threading.Event()
+        
+        def slow_run(image_path, prompt, **kwargs):
+            started.append(image_path)
+            finish.wait(10)
+            return {'success': True, 'videoUrl': f'/{image_path}.mp4'}
+        
+        responses = []
+        with patch.object(video_api_server.agento_video, 'run', side_effect=slow_run):
+            thread = threading.Thread(target=lambda: responses.append(post(server_url, {'requests': [
+                {'image_path': f'b{index}.jpg', 'prompt': 'spin'} for index in range(3)
+            ]}, path='/batch')))
+            thread.start()
+            try:
+                deadline = time.monotonic() + 10
+                while len(started) < 2:
+                    assert time.monotonic() < deadline
+                    time.sleep(0.05)
+                assert post(server_url, {'image_path': 'single.jpg', 'prompt': 'spin'}).status_code == 503
+            finally:
+                finish.set()
+                thread.join(10)
+        
+        lines = {line['index']: line for line in map(json.loads, responses[0].text.splitlines())}
+        assert lines[2] == {'index': 2, 'success': False, 'error': video_api_server._BUSY_MESSAGE}
+        assert lines[0]['success'] and lines[1]['success']
+        assert sorted(started) == ['b0.jpg', 'b1.jpg']
+    
+    def test_batch_validates_every_item(self, server_url):
+        """Test /batch rejects the whole batch if an item is invalid"""
+        with patch.object(video_api_server.agento_video, 'run') as run:
+            response = post(server_url, {'requests': [
+                {'image_path': 'a.jpg', 'prompt': 'spin'},
+                {'image_path': 'b.jpg'}
+            ]}, path='/batch')
+        
+        assert response.status_code == 400
+        run.assert_not_called()
+    
+    def test_isolated_mode_reads_result_file(self, isolated_server_url):
+        """Test isolated mode runs the CLI and returns the JSON it wrote to the result file"""
+        response = post(isolated_server_url, {'image_path': 'a.jpg', 'prompt': 'spin'})
+        assert response.json() == {'success': True, 'data': {'success': True, 'imagePath': 'a.jpg'}}
+        
+        response = post(isolated_server_url, {'image_path': 'missing.jpg', 'prompt': 'spin'})
+        assert response.json() == {'success': False, 'error': 'Source image not found', 'return_code': 1}
+    
+    def test_download_serves_files_under_root(self, tmp_path):
+        """Test GET /download sends files inside the download root only"""
+        root = tmp_path / 'video'
+        root.mkdir()
+        (root / 'v.mp4').write_bytes(b'video-bytes' * 1000)
+        (tmp_path / 'secret.txt').write_bytes(b'secret')
+        
+        server = ThreadingHTTPServer(('127.0.0.1', 0), video_api_server.create_handler(API_KEY, None, root))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_address[1]}/download"
+        headers = {'X-API-Key': API_KEY}
+        try:
+            response = requests.get(url, params={'path': str(root / 'v.mp4')}, headers=headers, timeout=10)
+            assert response.status_code == 200
+            assert response.headers['Content-Type'] == 'video/mp4'
+            assert response.content == b'video-bytes' * 1000
+            
+            assert requests.get(url, params={'path': 'v.mp4'}, headers=headers, timeout=10).content == response.content
+            assert requests.get(url, params={'path': '../secret.txt'}, headers=headers, timeout=10).status_code == 404
+            assert requests.get(url, params={'path': 'v.mp4'}, timeout=10).status_code == 401
+        finally:
+            server.shutdown()
+            server.server_close()
+    
+    def test_connection_kept_alive_between_requests(self, server_url):
+        """Test several requests (including a streamed one) share one HTTP/1.1 connection"""
+        result = {'success': True, 'status': 'completed'}
+        conn = HTTPConnection(server_url[len('http://'):], timeout=10)
+        headers = {'X-API-Key': API_KEY, 'Content-Type': 'application/json'}
+        body = json.dumps({'image_path': 'a.jpg', 'prompt': 'spin'})
+        sockets = []
+        try:
+            with patch.object(video_api_server.agento_video, 'run', return_value=result):
+                for path in ('/', '/stream', '/'):
+                    conn.request('POST', path, body=body, headers=headers)
+                    response = conn.getresponse()
+                    response.read()
+                    assert response.status == 200
+                    assert not response.will_close
+                    sockets.append(conn.sock)
+        finally:
+            conn.close()
+        
+        assert sockets[0] is not None
+        assert all(sock is sockets[0] for sock in sockets)
+    
+    def test_load_config(self, tmp_path, monkeypatch):
+        """Test settings come from arguments first, then the environment"""
+        monkeypatch.setenv('VIDEO_API_KEY', 'env-key')
+        monkeypatch.setenv('VIDEO_API_PORT', '9001')
+        monkeypatch.delenv('VIDEO_API_ISOLATED', raising=False)
+        monkeypatch.setenv('MAGENTO_BASE_PATH', str(tmp_path))
+        monkeypatch.delenv('VIDEO_SAVE_PATH', raising=False)
+        monkeypatch.delenv('VIDEO_API_DOWNLOAD_ROOT', raising=False)
+        
+        config = video_api_server._load_config(['--host', '0.0.0.0'])
+        assert (config.host, config.port, config.api_key) == ('0.0.0.0', 9001, 'env-key')
+        assert config.download_root == tmp_path / 'pub' / 'media' / 'video'
+        assert config.python_script is None
+        
+        config = video_api_server._load_config(['--isolated'])
+        assert config.python_script == Path(video_api_server.__file__).parent / 'agento_video.py'
+        
+        # A custom script implies isolated mode
+        script = tmp_path / 'agento_video.py'
+        script.write_text('')
+        config = video_api_server._load_config(['--python-script', str(script)])
+        assert config.python_script == script
+    
+    def test_cancel_queued_in_process_job(self, server_url, monkeypatch):
+        """Test an in-process job can be cancelled while queued but not once it runs"""
+        monkeypatch.setattr(video_api_server, '_generation_executor', ThreadPoolExecutor(max_workers=1))
+        started = threading.Event()
+        finish = threading.Event()
+        
+        def slow_run(image_path, prompt, **kwargs):
+            started.set()
+            finish.wait(10)
+            return {'success': True, 'videoUrl': f'/{image_path}.mp4'}
+        
+        responses = {}
+        
+        def send(name):
+            responses[name] = post(server_url, {'image_path': f'{name}.jpg', 'prompt': 'spin', 'job_id': name})
+        
+        with patch.object(video_api_server.agento_video, 'run', side_effect=slow_run) as run:
+            threads = [threading.Thread(target=send, args=(name,)) for name in ('running', 'queued')]
+            try:
+                threads[0].start()
+                assert started.wait(10)
+                threads[1].start()
+                deadline = time.monotonic() + 10
+                while not isinstance(video_api_server._jobs.get('queued'), Future):
+                    assert time.monotonic() < deadline
+                    time.sleep(0.05)
+                
+                assert post(server_url, {}, path='/cancel/queued').json() == {'success': True, 'cancelled': 'queued'}
+                assert post(server_url, {}, path='/cancel/running').status_code == 409
+            finally:
+                finish.set()
+                for thread in threads:
+                    thread.join(10)
+        
+        assert responses['queued'].json() == {'success': False, 'error': 'Video generation cancelled'}
+        assert responses['running'].json()['success'] is True
+        assert run.call_count == 1
+    
+    def test_in_process_batch_rejects_job_id(self, server_url):
+        """Test batch items can't carry a job_id in-process, where they can't be cancelled"""
+        with patch.object(video_api_server.agento_video, 'run') as run:
+            response = post(server_url, {'requests': [
+                {'image_path': 'a.jpg', 'prompt': 'spin', 'job_id': 'job-1'}
+            ]}, path='/batch')
+        
+        assert response.status_code == 400
+        run.assert_not_called()
+    
+    def test_cancel_isolated_job(self, isolated_server_url, tmp_path):
+        """Test POST /cancel/<job_id> kills a running isolated generation"""
+        responses = []
+        request = {'image_path': 'slow.jpg', 'prompt': 'spin', 'job_id': 'job-1'}
+        thread = threading.Thread(target=lambda: responses.append(post(isolated_server_url, request)))
+        thread.start()
+        pid = wait_for_pid(tmp_path / 'pid')
+        
+        assert post(isolated_server_url, {}, path='/cancel/unknown').status_code == 404
+        cancel = post(isolated_server_url, {}, path='/cancel/job-1')
+        thread.join(timeout=10)
+        
+        assert cancel.json() == {'success': True, 'cancelled': 'job-1'}
+        assert responses[0].json()['error'] == 'Video generation cancelled'
+        assert process_exited(pid)
+    
+    def test_client_disconnect_kills_isolated_job(self, isolated_server_url, tmp_path):
+        """Test an isolated generation is killed when the client closes the connection"""
+        body = json.dumps({'image_path': 'slow.jpg', 'prompt': 'spin'}).encode('utf-8')
+        host, port = isolated_server_url[len('http://'):].split(':')
+        with socket.create_connection((host, int(port)), timeout=10) as sock:
+            sock.sendall(
+                b'POST / HTTP/1.1\r\nHost: test\r\nX-API-Key: ' + API_KEY.encode('utf-8') +
+                b'\r\nContent-Type: application/json\r\nContent-Length: ' + str(len(body)).encode('utf-8') +
+                b'\r\n\r\n' + body
+            )
+            pid = wait_for_pid(tmp_path / 'pid')
+        
+        assert process_exited(pid)
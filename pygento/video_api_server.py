@@ -8,10 +8,25 @@ Authenticates requests using API key from environment variable
 import os
 import sys
 import json
+import hashlib
+import hmac
 import subprocess
+import tempfile
 import argparse
+import mimetypes
+import threading
+import queue
+import select
+import signal
+import socket
+import time
+import itertools
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from pathlib import Path
-from http.server import HTTPServer, BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 from urllib.parse import urlparse, parse_qs
 import logging
 
@@ -22,67 +37,652 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Use orjson for request/response bodies if available (parses and emits bytes directly)
+try:
+    import orjson
+    _orjson_available = True
+except ImportError:
+    _orjson_available = False
+
+# Import agento_video once so requests run in this process instead of a fresh interpreter
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import agento_video
+
+# Maximum time a single generation request may take
+GENERATION_TIMEOUT = 600  # 10 minutes
+
+# Seconds an idle keep-alive connection (or a stalled read/write) is kept open
+KEEP_ALIVE_TIMEOUT = 60
+
+# Maximum number of generation requests handled at once; further requests get 503
+MAX_CONCURRENT_GENERATIONS = max(1, int(os.getenv(
+    'VIDEO_API_CONCURRENCY', str(agento_video.MAX_PARALLEL_GENERATIONS)
+)))
+_generation_slots = threading.BoundedSemaphore(MAX_CONCURRENT_GENERATIONS)
+
+# Maximum number of requests in one /batch call
+MAX_BATCH_SIZE = max(1, int(os.getenv('VIDEO_API_MAX_BATCH', '32')))
+
+# Runs in-process generations so the request timeout can still be enforced
+_generation_executor = ThreadPoolExecutor(
+    max_workers=MAX_CONCURRENT_GENERATIONS,
+    thread_name_prefix='video-generation'
+)
+
+# Running generations by client-supplied job_id (see /cancel): the process in
+# --isolated mode, the executor future in-process
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+# Completed responses for repeated identical requests (LRU)
+RESPONSE_CACHE_SIZE = 128
+_response_cache: "OrderedDict[str, dict]" = OrderedDict()
+_response_cache_lock = threading.Lock()
+
+
+def _loads(body):
+    """
+    Parse a JSON request body
+    
+    Args:
+        body: Raw UTF-8 encoded body
+        
+    Returns:
+        Parsed JSON data (raises json.JSONDecodeError on invalid JSON)
+    """
+    if _orjson_available:
+        # orjson.JSONDecodeError subclasses json.JSONDecodeError
+        return orjson.loads(body)
+    return json.loads(body.decode('utf-8'))
+
+
+def _dumps(data):
+    """
+    Serialize a response body as indented JSON
+    
+    Args:
+        data: JSON-serializable data
+        
+    Returns:
+        UTF-8 encoded JSON
+    """
+    if _orjson_available:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2)
+    return json.dumps(data, indent=2).encode('utf-8')
+
+
+def _dumps_line(data):
+    """
+    Serialize data as compact single-line JSON terminated by a newline
+    
+    Args:
+        data: JSON-serializable data
+        
+    Returns:
+        UTF-8 encoded JSON line
+    """
+    if _orjson_available:
+        return orjson.dumps(data, option=orjson.OPT_APPEND_NEWLINE)
+    return json.dumps(data, separators=(',', ':')).encode('utf-8') + b'\n'
+
+
+def _sse_event(event, data):
+    """
+    Format a Server-Sent Events message
+    
+    Args:
+        event: Event name
+        data: JSON-serializable event payload (encoded on a single line)
+        
+    Returns:
+        UTF-8 encoded SSE message
+    """
+    return b'event: ' + event.encode('utf-8') + b'\ndata: ' + _dumps_line(data) + b'\n'
+
+
+def _error_body(message):
+    """
+    Build a JSON error response body
+    
+    Args:
+        message: Error message
+        
+    Returns:
+        UTF-8 encoded JSON with 'success' false and the error message
+    """
+    return _dumps_line({'success': False, 'error': message})
+
+
+# Error bodies for fixed messages, encoded once
+_ERR_UNAUTHORIZED = _error_body("Unauthorized: Invalid API key")
+_ERR_EMPTY_BODY = _error_body("Bad Request: Empty request body")
+_ERR_NO_REQUESTS = _error_body("Bad Request: 'requests' must be a non-empty array")
+_ERR_BATCH_TOO_LARGE = _error_body(f"Bad Request: 'requests' may hold at most {MAX_BATCH_SIZE} items")
+_ERR_NO_PATH = _error_body("Bad Request: 'path' is required")
+_ERR_NOT_FOUND = _error_body("Not Found")
+_ERR_JOB_STARTED = _error_body(
+    "Conflict: the job has already started; running jobs can only be cancelled in --isolated mode"
+)
+_BUSY_MESSAGE = "Service Unavailable: Too many concurrent requests"
+_ERR_BUSY = _error_body(_BUSY_MESSAGE)
+
+
+# Accepted generation request fields: (name, allowed types, required); None is
+# accepted for optional fields. Unknown fields are ignored.
+_REQUEST_FIELDS = (
+    ('image_path', (str, list), True),
+    ('prompt', (str,), True),
+    ('second_image', (str,), False),
+    ('aspect_ratio', (str,), False),
+    ('silent_video', (bool,), False),
+    ('sync', (bool,), False),
+    ('no_auto_reference', (bool,), False),
+    ('api_key', (str,), False),
+    ('base_path', (str,), False),
+    ('save_path', (str,), False),
+    ('base_url', (str,), False),
+    ('env_file', (str,), False),
+    ('cache', (bool,), False),
+    ('job_id', (str,), False),
+)
+
+_TYPE_NAMES = {str: 'a string', list: 'an array', bool: 'a boolean'}
+
+
+class _GenerationSlot:
+    """
+    One acquired _generation_slots slot, released exactly once
+    
+    The request handler releases it when done with the request, unless an in-process
+    generation that may outlive the request (e.g. after a timeout) has taken it over.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._released = False
+        self._held = False
+    
+    @classmethod
+    def acquire(cls):
+        """Take a free slot without waiting, or return None if all are busy"""
+        if not _generation_slots.acquire(blocking=False):
+            return None
+        return cls()
+    
+    def hold_until(self, future):
+        """Keep the slot until the future has finished or been cancelled"""
+        self._held = True
+        future.add_done_callback(lambda _: self.release())
+    
+    def done(self):
+        """Release the slot unless a generation has taken it over"""
+        if not self._held:
+            self.release()
+    
+    def release(self):
+        """Release the slot (only the first call has an effect)"""
+        with self._lock:
+            if self._released:
+                return
+            self._released = True
+        _generation_slots.release()
+
+
+def _kill_process_group(proc):
+    """
+    Terminate a generation process and everything it started
+    
+    Args:
+        proc: Popen started with start_new_session=True (its pid is the group id)
+    """
+    try:
+        if hasattr(os, 'killpg'):
+            os.killpg(proc.pid, signal.SIGTERM)
+        else:
+            proc.terminate()
+        proc.wait(timeout=5)
+    except ProcessLookupError:
+        pass
+    except subprocess.TimeoutExpired:
+        if hasattr(os, 'killpg'):
+            os.killpg(proc.pid, signal.SIGKILL)
+        else:
+            proc.kill()
+        proc.wait()
+
+
+def _reserve_job(job_id):
+    """
+    Reserve a job_id for a new generation
+    
+    Args:
+        job_id: job_id given in the generation request
+        
+    Returns:
+        True if reserved, False if a job with this ID is already running
+    """
+    with _jobs_lock:
+        if job_id in _jobs:
+            return False
+        # None marks a job_id reserved by a request whose generation is not started yet
+        _jobs[job_id] = None
+        return True
+
+
+def _release_job(job_id):
+    """Forget a finished generation's job_id"""
+    with _jobs_lock:
+        _jobs.pop(job_id, None)
+
+
+def _cancel_job(job_id):
+    """
+    Cancel a generation by its job_id
+    
+    Args:
+        job_id: job_id given in the generation request
+        
+    Returns:
+        'cancelled' if the job was cancelled, 'started' if it is an in-process
+        generation that already runs (it can't be interrupted), or None if no such
+        job is running
+    """
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+    if isinstance(job, Future):
+        # In-process generations can only be dropped while still queued
+        if job.cancel():
+            return 'cancelled'
+        return None if job.done() else 'started'
+    if job is None or job.poll() is not None:
+        return None
+    job.cancelled = True
+    _kill_process_group(job)
+    return 'cancelled'
+
+
+def _validation_error(request_data):
+    """
+    Check a generation request against the accepted fields and their types
+    
+    Args:
+        request_data: Parsed request body
+        
+    Returns:
+        Error message, or None if the request is valid
+    """
+    if not isinstance(request_data, dict):
+        return "request must be a JSON object"
+    for field, types, required in _REQUEST_FIELDS:
+        value = request_data.get(field)
+        if value is None:
+            if required:
+                return f"'{field}' is required"
+            continue
+        if not isinstance(value, types):
+            return f"'{field}' must be " + ' or '.join(_TYPE_NAMES[t] for t in types)
+    
+    image_paths = request_data['image_path']
+    if isinstance(image_paths, list) and (
+        not image_paths or not all(isinstance(path, str) for path in image_paths)
+    ):
+        return "'image_path' must be a non-empty array of strings"
+    return None
+
+
+def _run_kwargs(request_data):
+    """
+    Translate a generation request into agento_video.run() keyword arguments
+    
+    Args:
+        request_data: Parsed request body
+        
+    Returns:
+        Keyword arguments for agento_video.run()
+    """
+    # Settings from the request's env file apply to this request only: the server's
+    # own environment is shared by all requests, so the file is read, not loaded.
+    # As with --env-file on the command line, variables already set take precedence.
+    env = agento_video.read_env_file(request_data['env_file']) if request_data.get('env_file') else {}
+    
+    def setting(field, *names):
+        """Request field, else the first of the variables set in the environment or env file"""
+        if request_data.get(field):
+            return request_data[field]
+        for name in names:
+            value = os.getenv(name) or env.get(name)
+            if value:
+                return value
+        return None
+    
+    # An explicit base_url is used as given, so only pass one from the env file (with the
+    # normalization the generator applies to MAGENTO_BASE_URL/BASE_URL); the generator
+    # reads those variables from the server environment itself
+    env_base_url = None
+    if not (os.getenv('MAGENTO_BASE_URL') or os.getenv('BASE_URL')):
+        file_base_url = env.get('MAGENTO_BASE_URL') or env.get('BASE_URL')
+        if file_base_url:
+            env_base_url = agento_video.normalize_base_url(file_base_url)
+    
+    return {
+        'image_path': request_data['image_path'],
+        'prompt': request_data['prompt'],
+        'second_image': request_data.get('second_image') or None,
+        'aspect_ratio': request_data.get('aspect_ratio') or '16:9',
+        'silent_video': bool(request_data.get('silent_video', False)),
+        'sync': bool(request_data.get('sync', True)),  # Default to sync mode for API
+        'auto_reference': not request_data.get('no_auto_reference', False),
+        'api_key': setting('api_key', 'GEMINI_API_KEY'),
+        'base_path': setting('base_path', 'MAGENTO_BASE_PATH'),
+        'save_path': setting('save_path', 'VIDEO_SAVE_PATH'),
+        'base_url': request_data.get('base_url') or env_base_url,
+        # Keep the generator's console spinner out of the server log
+        'quiet': True
+    }
+
+
+def _response_from_result(result):
+    """
+    Wrap an agento_video.run() result in the API response format
+    
+    Args:
+        result: Result dict returned by agento_video.run()
+        
+    Returns:
+        Response dict with 'success' and 'data' or 'error'
+    """
+    if result.get('success'):
+        return {
+            'success': True,
+            'data': result
+        }
+    return {
+        'success': False,
+        'error': result.get('error') or result.get('errors') or 'Unknown error',
+        'return_code': 1
+    }
+
+
+def _image_fingerprint(image_path, base_path):
+    """
+    Get a stat-based fingerprint for a local image
+    
+    Args:
+        image_path: Image path (relative to pub/media/ or absolute)
+        base_path: Base path for Magento installation passed to the generator, if any
+        
+    Returns:
+        "mtime_ns:size" for the file the generator would read
+    """
+    # Same resolution (and base path default) as the generator that reads the image
+    base = Path(base_path or Path.cwd()).absolute()
+    st = os.stat(agento_video.resolve_image_path(image_path, base))
+    return f"{st.st_mtime_ns}:{st.st_size}"
+
+
+def _response_cache_key(run_kwargs):
+    """
+    Build the response cache key for a request
+    
+    Args:
+        run_kwargs: agento_video.run() keyword arguments for the request (see _run_kwargs),
+            so the key covers the settings actually used, including those from an env
+            file, and not fields such as job_id that don't affect the result
+        
+    Returns:
+        SHA-256 hex digest of the settings and the request's local images, or None if
+        the response should not be cached (URL or missing images, async requests)
+    """
+    if not run_kwargs['sync']:
+        return None
+    
+    image_paths = run_kwargs['image_path']
+    if isinstance(image_paths, str):
+        image_paths = [image_paths]
+    if run_kwargs['second_image']:
+        image_paths = [*image_paths, run_kwargs['second_image']]
+    
+    fingerprints = []
+    for image_path in image_paths:
+        # URL images may change behind the same URL; agento_video revalidates those itself
+        if not isinstance(image_path, str) or agento_video.is_url(image_path):
+            return None
+        try:
+            fingerprints.append(_image_fingerprint(image_path, run_kwargs['base_path']))
+        except OSError:
+            return None
+    
+    digest = hashlib.sha256(json.dumps(run_kwargs, sort_keys=True).encode('utf-8'))
+    digest.update('|'.join(fingerprints).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _videos_exist(data):
+    """Check that every video referenced by a generation result is still on disk"""
+    items = data.get('results', [data])
+    return all(item.get('videoPath') and os.path.exists(item['videoPath']) for item in items)
+
 
 class VideoAPIHandler(BaseHTTPRequestHandler):
     """HTTP request handler for video generation API"""
     
-    def __init__(self, *args, api_key=None, python_script=None, **kwargs):
-        self.api_key = api_key
+    # HTTP/1.1 keeps connections alive between requests; every response therefore
+    # has a Content-Length or uses chunked transfer encoding
+    protocol_version = 'HTTP/1.1'
+    timeout = KEEP_ALIVE_TIMEOUT
+    
+    def __init__(self, *args, api_key=None, python_script=None, download_root=None, command_prefix=None, **kwargs):
+        # Expected key as bytes (create_handler encodes it once)
+        self.api_key = api_key.encode('utf-8') if isinstance(api_key, str) else api_key
         self.python_script = python_script
+        # Interpreter and script arguments for --isolated mode (create_handler builds it once)
+        self.command_prefix = command_prefix or (
+            (sys.executable, str(python_script)) if python_script else None
+        )
+        self.download_root = download_root
         super().__init__(*args, **kwargs)
     
     def do_OPTIONS(self):
         """Handle CORS preflight requests"""
         self.send_response(200)
         self.send_header('Access-Control-Allow-Origin', '*')
-        self.send_header('Access-Control-Allow-Methods', 'POST, OPTIONS')
+        self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
         self.send_header('Access-Control-Allow-Headers', 'Content-Type, Authorization')
         self.send_header('Content-Length', '0')
         self.end_headers()
     
+    def do_GET(self):
+        """Handle GET /download?path=... requests for generated videos"""
+        try:
+            # Check authentication
+            if not self.authenticate():
+                self.send_json_error(401, _ERR_UNAUTHORIZED)
+                return
+            
+            url = urlparse(self.path)
+            if url.path != '/download' or self.download_root is None:
+                self.send_json_error(404, _ERR_NOT_FOUND)
+                return
+            
+            paths = parse_qs(url.query).get('path')
+            if not paths:
+                self.send_json_error(400, _ERR_NO_PATH)
+                return
+            
+            # Only serve files inside the download root (relative paths are relative to it)
+            file_path = (self.download_root / paths[0]).resolve()
+            if not file_path.is_relative_to(self.download_root) or not file_path.is_file():
+                self.send_json_error(404, _ERR_NOT_FOUND)
+                return
+            
+            self.send_file(file_path)
+            
+        except (BrokenPipeError, ConnectionResetError):
+            logger.info("Client disconnected during download")
+        except Exception as e:
+            logger.error("Error processing request: %s", e, exc_info=True)
+            self.send_json_error(500, _error_body(f"Internal Server Error: {str(e)}"), close=True)
+    
+    def send_json_error(self, code, body, close=False):
+        """
+        Send an error response with a small JSON body
+        
+        Args:
+            code: HTTP status code
+            body: Encoded JSON error body (see _error_body)
+            close: Close the connection afterwards (e.g. when the request body was not read)
+        """
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Access-Control-Allow-Origin', '*')
+        if close:
+            self.send_header('Connection', 'close')
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def send_file(self, file_path):
+        """Send a file as the response body, copied in the kernel with os.sendfile where available"""
+        with open(file_path, 'rb') as src:
+            size = os.fstat(src.fileno()).st_size
+            self.send_response(200)
+            self.send_header('Content-Type', mimetypes.guess_type(file_path.name)[0] or 'application/octet-stream')
+            self.send_header('Content-Length', str(size))
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.end_headers()
+            self.wfile.flush()
+            
+            # The whole file is read once front to back: ask for aggressive readahead
+            if hasattr(os, 'posix_fadvise'):
+                os.posix_fadvise(src.fileno(), 0, size, os.POSIX_FADV_SEQUENTIAL)
+            
+            # socket.sendfile uses os.sendfile where available (also with a socket
+            # timeout set) and falls back to send() otherwise
+            self.connection.sendfile(src, 0, size)
+    
+    def start_chunked_response(self, content_type):
+        """
+        Start a streamed 200 response using chunked transfer encoding
+        
+        Args:
+            content_type: Content-Type of the streamed body
+        """
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+    
+    def write_chunk(self, data):
+        """
+        Write one chunk of a chunked response (an empty chunk ends the response)
+        
+        Args:
+            data: Bytes to send
+        """
+        self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+        self.wfile.flush()
+    
     def do_POST(self):
         """Handle POST requests for video generation"""
         try:
             # Check authentication
             if not self.authenticate():
-                self.send_error(401, "Unauthorized: Invalid API key")
+                # The body is left unread, so the connection can't be reused
+                self.send_json_error(401, _ERR_UNAUTHORIZED, close=True)
                 return
             
             # Parse request
             content_length = int(self.headers.get('Content-Length', 0))
+            
+            path = urlparse(self.path).path
+            if path.startswith('/cancel/'):
+                self.rfile.read(content_length)
+                status = _cancel_job(path[len('/cancel/'):])
+                if status is None:
+                    self.send_json_error(404, _ERR_NOT_FOUND)
+                    return
+                if status == 'started':
+                    self.send_json_error(409, _ERR_JOB_STARTED)
+                    return
+                response_body = _dumps({'success': True, 'cancelled': path[len('/cancel/'):]})
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(response_body)))
+                self.send_header('Access-Control-Allow-Origin', '*')
+                self.end_headers()
+                self.wfile.write(response_body)
+                return
+            
             if content_length == 0:
-                self.send_error(400, "Bad Request: Empty request body")
+                self.send_json_error(400, _ERR_EMPTY_BODY, close=True)
                 return
             
             body = self.rfile.read(content_length)
             try:
-                request_data = json.loads(body.decode('utf-8'))
+                request_data = _loads(body)
             except json.JSONDecodeError as e:
-                self.send_error(400, f"Bad Request: Invalid JSON - {str(e)}")
+                self.send_json_error(400, _error_body(f"Bad Request: Invalid JSON - {str(e)}"))
                 return
             
-            # Validate required fields
-            if 'image_path' not in request_data:
-                self.send_error(400, "Bad Request: 'image_path' is required")
-                return
+            # Validate required fields (of every item for a batch)
+            if path == '/batch':
+                items = request_data.get('requests') if isinstance(request_data, dict) else None
+                if not isinstance(items, list) or not items:
+                    self.send_json_error(400, _ERR_NO_REQUESTS)
+                    return
+                if len(items) > MAX_BATCH_SIZE:
+                    self.send_json_error(400, _ERR_BATCH_TOO_LARGE)
+                    return
+                for index, item in enumerate(items):
+                    error = _validation_error(item)
+                    if not error and item.get('job_id') and not self.python_script:
+                        # In-process batch items run together and can't be cancelled one by one
+                        error = "'job_id' is only supported for batch items in --isolated mode"
+                    if error:
+                        self.send_json_error(400, _error_body(f"Bad Request: requests[{index}]: {error}"))
+                        return
+            else:
+                error = _validation_error(request_data)
+                if error:
+                    self.send_json_error(400, _error_body(f"Bad Request: {error}"))
+                    return
             
-            if 'prompt' not in request_data:
-                self.send_error(400, "Bad Request: 'prompt' is required")
+            # Generate video (reject rather than queue when all slots are busy)
+            slot = _GenerationSlot.acquire()
+            if slot is None:
+                self.send_json_error(503, _ERR_BUSY)
                 return
-            
-            # Generate video
-            result = self.generate_video(request_data)
+            if path == '/stream':
+                # The stream's worker holds the slot until generation finishes,
+                # even if the client disconnects first
+                self.stream_video(request_data, slot)
+                return
+            if path == '/batch':
+                # Likewise held until every item of the batch has finished
+                self.batch_videos(items, slot)
+                return
+            try:
+                result = self.generate_video(request_data, slot)
+            finally:
+                slot.done()
             
             # Send response
+            response_body = _dumps(result)
             self.send_response(200)
             self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(response_body)))
             self.send_header('Access-Control-Allow-Origin', '*')
             self.end_headers()
-            self.wfile.write(json.dumps(result, indent=2).encode('utf-8'))
+            self.wfile.write(response_body)
             
+        except (BrokenPipeError, ConnectionResetError):
+            logger.info("Client disconnected before the response was sent")
+            self.close_connection = True
         except Exception as e:
-            logger.error(f"Error processing request: {str(e)}", exc_info=True)
-            self.send_error(500, f"Internal Server Error: {str(e)}")
+            logger.error("Error processing request: %s", e, exc_info=True)
+            self.send_json_error(500, _error_body(f"Internal Server Error: {str(e)}"), close=True)
     
     def authenticate(self):
         """Authenticate request using API key"""
@@ -99,18 +699,206 @@ class VideoAPIHandler(BaseHTTPRequestHandler):
         elif api_key_header:
             provided_key = api_key_header
         
-        # Compare with expected API key
-        if not provided_key:
+        # Compare with expected API key in constant time (no early exit on the first
+        # mismatching byte)
+        if not provided_key or not self.api_key:
             return False
         
-        return provided_key == self.api_key
+        return hmac.compare_digest(provided_key.encode('utf-8'), self.api_key)
+    
+    def stream_video(self, request_data, slot):
+        """
+        Generate video, streaming progress events and the final result as SSE
+        
+        Takes over the generation slot acquired by the caller and releases it once
+        generation finishes.
+        
+        Args:
+            request_data: Parsed request body
+            slot: Generation slot held for the request
+        """
+        events = queue.Queue()
+        
+        def worker():
+            try:
+                result = self.generate_video(request_data, slot, on_progress=lambda e: events.put(('progress', e)))
+            finally:
+                slot.done()
+            events.put(('result', result))
+        
+        try:
+            threading.Thread(target=worker, name='video-stream', daemon=True).start()
+        except BaseException:
+            slot.release()
+            raise
+        
+        self.start_chunked_response('text/event-stream')
+        
+        while True:
+            event, data = events.get()
+            try:
+                self.write_chunk(_sse_event(event, data))
+                if event == 'result':
+                    self.write_chunk(b'')
+                    return
+            except (BrokenPipeError, ConnectionResetError):
+                logger.info("Client disconnected from progress stream")
+                self.close_connection = True
+                return
+    
+    def batch_videos(self, items, slot):
+        """
+        Generate videos for several requests, streaming one NDJSON line per finished item
+        
+        Takes over the generation slot acquired by the caller. In-process, every item
+        runs in a slot of its own, held until that item has finished; items beyond the
+        free slots are rejected as busy.
+        
+        Args:
+            items: Validated request bodies
+            slot: Generation slot held for the request
+        """
+        if self.python_script:
+            # Items run one after another in this thread
+            try:
+                self.write_batch_responses(
+                    (index, self.generate_video(item)) for index, item in enumerate(items)
+                )
+            finally:
+                slot.release()
+            return
+        
+        slots = [slot]
+        while len(slots) < len(items):
+            extra = _GenerationSlot.acquire()
+            if extra is None:
+                break
+            slots.append(extra)
+        
+        # One batch shares generators; its items run on the executor shared with
+        # single requests, each in its own slot, so the batch stays within the
+        # concurrency limit even after a timeout or disconnect
+        try:
+            results = agento_video.run_batch(
+                [_run_kwargs(item) for item in items[:len(slots)]],
+                timeout=GENERATION_TIMEOUT,
+                executor=_generation_executor,
+                on_done=lambda index: slots[index].release()
+            )
+        except BaseException:
+            for held in slots:
+                held.release()
+            raise
+        
+        busy = {'success': False, 'error': _BUSY_MESSAGE}
+        self.write_batch_responses(itertools.chain(
+            ((index, busy) for index in range(len(slots), len(items))),
+            ((index, _response_from_result(result)) for index, result in results)
+        ))
     
-    def generate_video(self, request_data):
-        """Generate video by calling agento_video.py CLI"""
+    def write_batch_responses(self, responses):
+        """Stream (index, response) pairs as NDJSON lines"""
+        self.start_chunked_response('application/x-ndjson')
+        
+        try:
+            for index, response in responses:
+                self.write_chunk(_dumps_line({'index': index, **response}))
+            self.write_chunk(b'')
+        except (BrokenPipeError, ConnectionResetError):
+            logger.info("Client disconnected from batch stream")
+            self.close_connection = True
+    
+    def generate_video(self, request_data, slot=None, on_progress=None):
+        """
+        Generate video, reusing the response of an identical earlier request
+        
+        Args:
+            request_data: Parsed request body
+            slot: Generation slot held for the request; an in-process generation keeps
+                it until it has finished, even after a timeout
+            on_progress: Optional callback for progress events (in-process mode only)
+            
+        Returns:
+            Response dict with 'success' and 'data' or 'error'
+        """
+        cache_key = None
+        if request_data.get('cache', True):
+            cache_key = _response_cache_key(_run_kwargs(request_data))
+        
+        if cache_key:
+            with _response_cache_lock:
+                response = _response_cache.get(cache_key)
+                if response is not None:
+                    _response_cache.move_to_end(cache_key)
+            if response is not None and _videos_exist(response['data']):
+                return response
+        
+        if self.python_script:
+            response = self.generate_video_subprocess(request_data)
+        else:
+            response = self.generate_video_in_process(request_data, slot, on_progress)
+        
+        if cache_key and response.get('success') and isinstance(response.get('data'), dict) \
+                and _videos_exist(response['data']):
+            with _response_cache_lock:
+                _response_cache[cache_key] = response
+                _response_cache.move_to_end(cache_key)
+                while len(_response_cache) > RESPONSE_CACHE_SIZE:
+                    _response_cache.popitem(last=False)
+        return response
+    
+    def generate_video_in_process(self, request_data, slot=None, on_progress=None):
+        """Generate video by calling agento_video in-process"""
+        # Reserve the job_id so the job can be cancelled via /cancel/<job_id> while queued
+        job_id = request_data.get('job_id')
+        if job_id and not _reserve_job(job_id):
+            return {
+                'success': False,
+                'error': f"job_id '{job_id}' is already running"
+            }
+        
+        future = None
+        try:
+            future = _generation_executor.submit(
+                agento_video.run, **_run_kwargs(request_data), on_progress=on_progress
+            )
+            if slot is not None:
+                # The slot is freed when the generation ends, not when this request does
+                slot.hold_until(future)
+            if job_id:
+                with _jobs_lock:
+                    _jobs[job_id] = future
+                future.add_done_callback(lambda _: _release_job(job_id))
+            return _response_from_result(future.result(timeout=GENERATION_TIMEOUT))
+            
+        except CancelledError:
+            return {
+                'success': False,
+                'error': 'Video generation cancelled'
+            }
+        except FutureTimeoutError:
+            # A generation still queued is dropped; a running one can't be interrupted
+            # and keeps its slot until it finishes
+            future.cancel()
+            return {
+                'success': False,
+                'error': f'Video generation timed out after {GENERATION_TIMEOUT:g} seconds'
+            }
+        except Exception as e:
+            logger.error("Error generating video: %s", e, exc_info=True)
+            return {
+                'success': False,
+                'error': str(e)
+            }
+        finally:
+            if job_id and future is None:
+                _release_job(job_id)
+    
+    def generate_video_subprocess(self, request_data):
+        """Generate video by calling agento_video.py CLI in a separate process"""
         try:
             # Build command
-            python_executable = sys.executable
-            command = [python_executable, str(self.python_script)]
+            command = list(self.command_prefix)
             
             # Add image path(s) - support both single string and array
             image_paths = request_data['image_path']
@@ -161,69 +949,194 @@ class VideoAPIHandler(BaseHTTPRequestHandler):
             if request_data.get('env_file'):
                 command.extend(['--env-file', request_data['env_file']])
             
-            logger.info(f"Executing command: {' '.join(command)}")
-            
-            # Execute command
-            result = subprocess.run(
-                command,
-                capture_output=True,
-                text=True,
-                timeout=600  # 10 minute timeout
-            )
+            # Reserve the job_id so the job can be cancelled via /cancel/<job_id>
+            job_id = request_data.get('job_id')
+            if job_id and not _reserve_job(job_id):
+                return {
+                    'success': False,
+                    'error': f"job_id '{job_id}' is already running"
+                }
             
-            # Parse output
-            if result.returncode == 0:
+            result_path = None
+            try:
+                # The CLI writes its JSON result to a file; logs on stderr go to a temp file
+                # on disk rather than being buffered in memory
+                fd, result_path = tempfile.mkstemp(prefix='video-api-', suffix='.json')
+                os.close(fd)
+                command.extend(['--result-file', result_path])
+                
+                logger.info("Executing command: %s", command)
+                
+                # Execute command in its own process group so cancelling kills the whole job
+                with tempfile.TemporaryFile() as stderr_file:
+                    proc = subprocess.Popen(
+                        command,
+                        stdout=subprocess.DEVNULL,
+                        stderr=stderr_file,
+                        start_new_session=True
+                    )
+                    proc.cancelled = False
+                    if job_id:
+                        with _jobs_lock:
+                            _jobs[job_id] = proc
+                    returncode = self.wait_for_process(proc)
+                    stderr_file.seek(0)
+                    stderr = stderr_file.read()
+                
+                # Parse output (raw bytes; orjson decodes UTF-8 while parsing)
                 try:
-                    # Try to parse JSON output
-                    output_json = json.loads(result.stdout)
+                    output_json = _loads(Path(result_path).read_bytes())
+                except json.JSONDecodeError:
+                    output_json = None
+            finally:
+                if result_path:
+                    os.unlink(result_path)
+                if job_id:
+                    _release_job(job_id)
+            
+            if proc.cancelled:
+                return {
+                    'success': False,
+                    'error': 'Video generation cancelled',
+                    'return_code': returncode
+                }
+            
+            if returncode == 0:
+                if output_json is not None:
                     return {
                         'success': True,
                         'data': output_json
                     }
-                except json.JSONDecodeError:
-                    # If not JSON, return as text
-                    return {
-                        'success': True,
-                        'data': {
-                            'output': result.stdout,
-                            'message': 'Video generation completed'
-                        }
+                # If no JSON result, return the log as text
+                return {
+                    'success': True,
+                    'data': {
+                        'output': stderr.decode('utf-8', 'replace'),
+                        'message': 'Video generation completed'
                     }
+                }
             else:
                 # Error occurred
-                error_msg = result.stderr or result.stdout or 'Unknown error'
+                error_msg = stderr.decode('utf-8', 'replace') \
+                    or (output_json and (output_json.get('error') or output_json.get('errors'))) \
+                    or 'Unknown error'
                 return {
                     'success': False,
                     'error': error_msg,
-                    'return_code': result.returncode
+                    'return_code': returncode
                 }
                 
         except subprocess.TimeoutExpired:
             return {
                 'success': False,
-                'error': 'Video generation timed out after 10 minutes'
+                'error': f'Video generation timed out after {GENERATION_TIMEOUT:g} seconds'
+            }
+        except ConnectionAbortedError:
+            logger.info("Client disconnected; generation process killed")
+            self.close_connection = True
+            return {
+                'success': False,
+                'error': 'Client disconnected'
             }
         except Exception as e:
-            logger.error(f"Error generating video: {str(e)}", exc_info=True)
+            logger.error("Error generating video: %s", e, exc_info=True)
             return {
                 'success': False,
                 'error': str(e)
             }
     
+    def wait_for_process(self, proc):
+        """
+        Wait for a generation process, killing it if the client goes away or it times out
+        
+        Args:
+            proc: Popen started with start_new_session=True
+            
+        Returns:
+            Process exit code
+            
+        Raises:
+            subprocess.TimeoutExpired: The process ran longer than GENERATION_TIMEOUT
+            ConnectionAbortedError: The client closed the connection
+        """
+        deadline = time.monotonic() + GENERATION_TIMEOUT
+        watch_client = True
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                _kill_process_group(proc)
+                raise subprocess.TimeoutExpired(proc.args, GENERATION_TIMEOUT)
+            
+            if not watch_client:
+                try:
+                    return proc.wait(timeout=remaining)
+                except subprocess.TimeoutExpired:
+                    continue
+            
+            # The socket turns readable when the client closes it (recv returns b'')
+            readable, _, _ = select.select([self.connection], [], [], min(0.5, remaining))
+            if readable:
+                try:
+                    peeked = self.connection.recv(1, socket.MSG_PEEK)
+                except BlockingIOError:
+                    peeked = None  # Spurious wakeup
+                except ConnectionResetError:
+                    peeked = b''
+                if peeked == b'':
+                    _kill_process_group(proc)
+                    raise ConnectionAbortedError("client disconnected")
+                if peeked:
+                    # The client already sent its next request; stop watching the socket
+                    watch_client = False
+            
+            returncode = proc.poll()
+            if returncode is not None:
+                return returncode
+    
     def log_message(self, format, *args):
         """Override to use logger instead of stderr"""
-        logger.info(f"{self.address_string()} - {format % args}")
+        # address_string() and the message are only formatted if INFO is enabled
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("%s - %s", self.address_string(), format % args)
 
 
-def create_handler(api_key, python_script):
+def create_handler(api_key, python_script, download_root=None):
     """Factory function to create handler with dependencies"""
+    # Encode the key, build the command prefix and resolve the download root once
+    # rather than per request
+    api_key = api_key.encode('utf-8')
+    command_prefix = (sys.executable, str(python_script)) if python_script else None
+    if download_root is not None:
+        download_root = Path(download_root).resolve()
+    
     def handler(*args, **kwargs):
-        return VideoAPIHandler(*args, api_key=api_key, python_script=python_script, **kwargs)
+        return VideoAPIHandler(
+            *args, api_key=api_key, python_script=python_script, download_root=download_root,
+            command_prefix=command_prefix, **kwargs
+        )
     return handler
 
 
-def main():
-    """Main entry point"""
+@dataclass(frozen=True)
+class Config:
+    """Server settings resolved once from command line arguments and environment"""
+    host: str
+    port: int
+    api_key: str
+    download_root: Path
+    python_script: Optional[Path] = None  # Set in --isolated mode
+
+
+def _load_config(argv=None):
+    """
+    Parse command line arguments (with environment defaults) into a Config
+    
+    Args:
+        argv: Arguments to parse (defaults to sys.argv[1:])
+        
+    Returns:
+        Config instance (exits if the --isolated script does not exist)
+    """
     parser = argparse.ArgumentParser(description='Video Generation API Server')
     parser.add_argument(
         '--host',
@@ -242,34 +1155,66 @@ def main():
         required=not bool(os.getenv('VIDEO_API_KEY')),
         help='API key for authentication (or set VIDEO_API_KEY env var)'
     )
+    parser.add_argument(
+        '--download-root',
+        default=os.getenv('VIDEO_API_DOWNLOAD_ROOT'),
+        help='Directory served by GET /download (default: the default video directory, '
+             'MAGENTO_BASE_PATH/VIDEO_SAVE_PATH, or VIDEO_API_DOWNLOAD_ROOT env)'
+    )
+    parser.add_argument(
+        '--isolated',
+        action='store_true',
+        default=os.getenv('VIDEO_API_ISOLATED', '').lower() in ('1', 'true', 'yes'),
+        help='Run each request in a separate agento_video.py process (or set VIDEO_API_ISOLATED env)'
+    )
     parser.add_argument(
         '--python-script',
         default=None,
-        help='Path to agento_video.py script (auto-detected if not provided)'
+        help='Path to agento_video.py script to run per request (implies --isolated; auto-detected if not provided)'
     )
     
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     
-    # Auto-detect Python script path if not provided
-    if not args.python_script:
-        script_dir = Path(__file__).parent
-        args.python_script = script_dir / 'agento_video.py'
-        
-        if not args.python_script.exists():
-            logger.error(f"Python script not found: {args.python_script}")
+    if args.isolated or args.python_script:
+        # Auto-detect Python script path if not provided
+        python_script = Path(args.python_script or Path(__file__).parent / 'agento_video.py')
+        if not python_script.exists():
+            logger.error("Python script not found: %s", python_script)
             sys.exit(1)
+    else:
+        python_script = None
+    
+    # Serve downloads from the directory videos are saved to by default
+    download_root = Path(args.download_root or (
+        Path(os.getenv('MAGENTO_BASE_PATH') or Path.cwd()) / (os.getenv('VIDEO_SAVE_PATH') or 'pub/media/video')
+    ))
     
-    if not Path(args.python_script).exists():
-        logger.error(f"Python script not found: {args.python_script}")
-        sys.exit(1)
+    return Config(
+        host=args.host,
+        port=args.port,
+        api_key=args.api_key,
+        download_root=download_root,
+        python_script=python_script
+    )
+
+
+def main():
+    """Main entry point"""
+    # Load .env file first (before reading configuration from the environment)
+    agento_video.load_env_file()
+    config = _load_config()
     
     # Create server
-    handler = create_handler(args.api_key, Path(args.python_script))
-    server = HTTPServer((args.host, args.port), handler)
+    handler = create_handler(config.api_key, config.python_script, config.download_root)
+    server = ThreadingHTTPServer((config.host, config.port), handler)
     
-    logger.info(f"Video API Server starting on http://{args.host}:{args.port}")
-    logger.info(f"API Key: {'*' * (len(args.api_key) - 4) + args.api_key[-4:] if len(args.api_key) > 4 else '***'}")
-    logger.info(f"Python Script: {args.python_script}")
+    logger.info("Video API Server starting on http://%s:%s", config.host, config.port)
+    logger.info("API Key: %s", '*' * (len(config.api_key) - 4) + config.api_key[-4:] if len(config.api_key) > 4 else '***')
+    logger.info("Download Root: %s", config.download_root)
+    if config.python_script:
+        logger.info("Python Script: %s (isolated)", config.python_script)
+    else:
+        logger.info("Running agento_video in-process")
     
     try:
         server.serve_forever()